@@ -1,18 +1,55 @@
+import time
+
+# Время запуска для отчета о скорости старта
+STARTED = time.perf_counter()
+
+import importlib
+import sys
+import threading
+
+import pygame
 from pygame.locals import *
-from forinarow import *
-from py2048 import DveTysyachiSorokVosyem
-from tetris import Tetris
 import music
+from profiler import profiler
+
+IMPORTED = time.perf_counter()
+
+# Наибольшее время ожидания события в меню, мс
+IDLE_TIMEOUT = 1000
+# Список системных шрифтов загружен фоновым потоком prefetch. Флаг проверяется при каждой
+# отрисовке меню, а событие FONTS_READY только будит цикл меню: его может забрать цикл игры
+FONTS_LOADED = threading.Event()
+FONTS_READY = pygame.event.custom_type()
+
+# Игры подключаются при первом запуске (или заранее, фоновым потоком после первого кадра меню):
+# модуль, класс игры и метод, запускающий игровой цикл
+GAMES = [('py2048', 'DveTysyachiSorokVosyem', 'play'),
+         ('tetris', 'Tetris', 'cycle'),
+         ('forinarow', 'FourInARow', 'start')]
+
+
+def prefetch():
+    # Заранее загружаем модули игр, список системных шрифтов и фон тетриса,
+    # чтобы первый запуск игры не ждал их. Когда шрифты найдены, меню перерисовывается своим шрифтом
+    for module, _, _ in GAMES:
+        importlib.import_module(module)
+    pygame.font.get_fonts()
+    FONTS_LOADED.set()
+    pygame.event.post(pygame.event.Event(FONTS_READY))
+    importlib.import_module('tetris').load_background()
+
 
 class Menu:
     def __init__(self):
-        # Инициализация Pygame и параметров меню
+        # Инициализация Pygame (единственная, общая для меню и всех игр) и параметров меню
         pygame.init()
+        self.times = [('imports', IMPORTED - STARTED), ('init', time.perf_counter() - IMPORTED)]
 
-        # Настройка часов для контроля FPS
-        self.cl = pygame.time.Clock()
-        # Шрифт для отображения текста
-        self.font = pygame.font.SysFont("Comic Sans MS", 20)
+        # Шрифт для отображения текста. Поиск системного шрифта (SysFont) просматривает все шрифты
+        # системы, поэтому первый кадр рисуется встроенным шрифтом, а Comic Sans подключается
+        # после фоновой загрузки списка шрифтов (флаг FONTS_LOADED)
+        self.font = pygame.font.Font(None, 26)
+        self.sys_font = False  # подключен ли уже Comic Sans
         # Создание окна 400x500 пикселей
         self.screen = pygame.display.set_mode((400, 500), 0, 32)
 
@@ -34,25 +71,77 @@ class Menu:
         self.button_3 = pygame.Rect(self.imrects[2])
         self.button_4 = pygame.Rect(self.imrects[3])
 
+        # Иконка окна загружается один раз
+        self.icon = pygame.image.load('icons/menu.png')
+        # Меню рисуется один раз в отдельную поверхность, дальше она только копируется на экран
+        self.surface = pygame.Surface(self.screen.get_size()).convert()
+        self.render()
+        self.hover = None  # кнопка под курсором
+
         # Первоначальная отрисовка меню
         self.draw()
-        # Флаг, указывающий, что игра запущена
-        self.playing = False
 
-    def draw(self):
-        # Прорисовка основного меню
-        pygame.display.set_caption("Main Menu")
-        # Установка иконки окна
-        programicon = pygame.image.load('icons/menu.png')
-        pygame.display.set_icon(programicon)
-        # Установка цвета фона экрана
-        self.screen.fill(pygame.Color("lightblue"))
-        # Отображение иконок игр на экране
+    def render(self):
+        # Прорисовка основного меню в поверхность self.surface
+        # Установка цвета фона
+        self.surface.fill(pygame.Color("lightblue"))
+        # Отображение иконок игр
         for im, rect in zip(self.ims, self.imrects):
-            self.screen.blit(im, rect)
+            self.surface.blit(im, rect)
 
         # Вывод заголовка "GAMES:"
-        self.draw_text('GAMES:', self.font, (255, 255, 255), self.screen, 20, 20)
+        self.draw_text('GAMES:', self.font, (255, 255, 255), self.surface, 20, 20)
+
+    def draw(self):
+        # Вывод меню на экран целиком (при запуске и после возвращения из игры)
+        if not self.sys_font and FONTS_LOADED.is_set():
+            self.font = pygame.font.SysFont("Comic Sans MS", 20)
+            self.sys_font = True
+            self.render()
+        pygame.display.set_caption("Main Menu")
+        pygame.display.set_icon(self.icon)
+        self.screen.blit(self.surface, (0, 0))
+        if self.hover is not None:
+            pygame.draw.rect(self.screen, (255, 255, 255), self.hover, 3)
+        pygame.display.update()
+
+    def set_hover(self, button):
+        # Подсветка кнопки под курсором; экран обновляется, только если кнопка сменилась
+        if button == self.hover:
+            return
+        dirty = [r for r in (self.hover, button) if r is not None]
+        for rect in dirty:
+            self.screen.blit(self.surface, rect, rect)
+        self.hover = button
+        if button is not None:
+            pygame.draw.rect(self.screen, (255, 255, 255), button, 3)
+        pygame.display.update(dirty)
+
+    def button_at(self, pos):
+        # Кнопка игры под точкой pos и номер игры или (None, None)
+        for index, button in enumerate((self.button_1, self.button_2, self.button_3)):
+            if button.collidepoint(pos):
+                return button, index
+        return None, None
+
+    def launch(self, index):
+        # Запуск игры: модуль импортируется при первом запуске, дальше берется готовый
+        module, cls, method = GAMES[index]
+        game_cls = getattr(importlib.import_module(module), cls)
+        g = game_cls(6, 7) if cls == 'FourInARow' else game_cls(self.screen)
+        getattr(g, method)()
+        self.restore_window()
+
+    def report_startup(self):
+        # Отчет о времени до первого кадра меню
+        self.times.append(('first frame', time.perf_counter() - STARTED))
+        print("startup: " + ", ".join("{} {:.0f} ms".format(name, 1000 * t) for name, t in self.times))
+
+    def restore_window(self):
+        # Игра вернула управление (play/cycle/start закончились) - возвращаем окно меню
+        self.screen = pygame.display.set_mode((400, 500), 0, 32)
+        # Клики, сделанные в окне игры, не должны выбрать игру в меню
+        pygame.event.clear(MOUSEBUTTONDOWN)
 
     @staticmethod
     def draw_text(text, font, color, surface, x, y):
@@ -63,63 +152,56 @@ class Menu:
         surface.blit(textobj, textrect)
 
     def main_menu(self):
-        # Основной цикл меню
-        click = False
+        # Основной цикл меню. Меню перерисовывается только при событиях (наведение на иконку,
+        # возвращение из игры), а без событий поток спит в ожидании очереди событий.
+        # Меню уже на экране: теперь можно запустить музыку и подготовить игры в фоне
+        self.report_startup()
+        music.play_music()
+        threading.Thread(target=prefetch, daemon=True).start()
+
+        profiler.section('menu')
         while True:
-            # Если ни одна игра не запущена, отрисовать меню
-            if not self.playing:
-                self.draw()
-            else:
-                # Проверить файл, чтобы определить, завершилась ли игра
-                with open("game_end.txt", "r+") as fil:
-                    if fil.read():
-                        self.playing = False
-
-            # Получение координат мыши для проверки нажатий
-            mx, my = pygame.mouse.get_pos()
-            if click:
-                # Проверка, нажата ли одна из кнопок с играми
-                if self.button_1.collidepoint((mx, my)):
-                    # Запуск игры 2048
-                    g = DveTysyachiSorokVosyem(self.screen)
-                    g.play()
-                    self.playing = True
-                elif self.button_2.collidepoint((mx, my)):
-                    # Запуск игры Тетрис
-                    g = Tetris(self.screen)
-                    g.cycle()
-                    self.playing = True
-                elif self.button_3.collidepoint((mx, my)):
-                    # Запуск игры 4 в ряд
-                    g = FourInARow(6, 7)
-                    g.start()
-                    self.playing = True
-
-            # Сброс флага клика
-            click = False
-            # Обработка событий
-            for event in pygame.event.get():
+            profiler.frame()
+            # Ожидание события не дольше IDLE_TIMEOUT мс, затем разбираем все накопившиеся
+            events = [pygame.event.wait(IDLE_TIMEOUT)] + pygame.event.get()
+            profiler.lap('wait')
+            for event in events:
                 if event.type == QUIT:
+                    music.stop_music()
                     pygame.quit()
                     exit()
                 if event.type == KEYDOWN:
                     if event.key == K_ESCAPE:
+                        # Поток музыки останавливается до того, как pygame.quit закроет микшер
+                        music.stop_music()
                         pygame.quit()
                         sys.exit()
-                if event.type == MOUSEBUTTONDOWN:
-                    if event.button == 1:
-                        click = True
-                # Если музыка остановилась, перезапустить ее
-                if event.type == music.STOPPED_PLAYING:
-                    music.play_music()
-
-            # Обновление экрана
-            pygame.display.update()
-            # Ограничение частоты кадров (60 FPS)
-            self.cl.tick(60)
+                if event.type == MOUSEMOTION:
+                    self.set_hover(self.button_at(event.pos)[0])
+                if event.type == MOUSEBUTTONDOWN and event.button == 1:
+                    # Проверка, нажата ли одна из кнопок с играми (0 - 2048, 1 - Тетрис, 2 - 4 в ряд)
+                    index = self.button_at(event.pos)[1]
+                    if index is not None:
+                        self.launch(index)
+                        # Остальные события относились к окну игры
+                        profiler.section('menu')
+                        self.hover = None
+                        self.draw()
+                        break
+                if event.type == FONTS_READY:
+                    self.draw()
+                if event.type in (VIDEOEXPOSE, WINDOWEXPOSED) or profiler.handle_event(event):
+                    # Окно было перекрыто (или спрятана панель профайлера) - рисуем его заново
+                    self.draw()
+            profiler.lap('events')
+
+            hud = profiler.draw_hud(self.screen)
+            if hud:
+                pygame.display.update(hud)
+            profiler.lap('draw')
+
 
 if __name__ == '__main__':
-    # Запуск музыки и меню
-    music.play_music()
+    # Запуск меню (музыка включается после первого кадра)
     m = Menu()
     m.main_menu()
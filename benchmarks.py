@@ -0,0 +1,335 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+# Замеры идут без окна и без звука
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+# Игры читают картинки и данные относительно папки проекта
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pygame
+
+import tetris_core
+
+# Файл с базовыми результатами по умолчанию
+BASELINE_PATH = 'benchmarks.json'
+# Рост времени больше этой доли считается замедлением
+THRESHOLD = 0.10
+
+# Зарегистрированные замеры: имя -> функция, возвращающая время одной операции в секундах
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def measure(run, number, repeat, setup=None):
+    # Лучшее из repeat повторений время одного вызова run (setup перед повторением не замеряется)
+    best = float('inf')
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+# Позиции "4 в ряд" для замеров: столбцы ходов, игроки ходят по очереди
+FOUR_POSITIONS = ['', '3323', '33224411', '3232441105']
+
+
+def four_positions():
+    from forinarow_board import Position, PLAYER_PIECE, AI_PIECE
+    positions = []
+    for moves in FOUR_POSITIONS:
+        position = Position(6, 7)
+        for i, col in enumerate(moves):
+            position.play(int(col), PLAYER_PIECE if i % 2 == 0 else AI_PIECE)
+        positions.append(position)
+    return positions
+
+
+def four_game():
+    from forinarow import FourInARow
+    return FourInARow(6, 7)
+
+
+def minimax_benchmark(depth, repeat):
+    from forinarow_search import Searcher
+    game = four_game()
+    positions = four_positions()
+
+    def setup():
+        # Каждое повторение - с пустой таблицей транспозиций
+        game.searcher = Searcher()
+
+    def run():
+        for position in positions:
+            game.minimax(position, depth, -float('inf'), float('inf'), True)
+    return measure(run, 1, repeat, setup) / len(positions)
+
+
+@benchmark('forinarow.minimax_depth4')
+def bench_minimax4(repeat):
+    return minimax_benchmark(4, repeat)
+
+
+@benchmark('forinarow.minimax_depth6')
+def bench_minimax6(repeat):
+    return minimax_benchmark(6, repeat)
+
+
+@benchmark('forinarow.winning_move')
+def bench_winning_move(repeat):
+    from forinarow import FourInARow
+    from forinarow_board import PLAYER_PIECE
+    rng = np.random.default_rng(1)
+    boards = [rng.integers(0, 3, (6, 7)).astype(float) for _ in range(100)]
+
+    def run():
+        for board in boards:
+            FourInARow.winning_move(board, PLAYER_PIECE)
+    return measure(run, 10, repeat) / len(boards)
+
+
+@benchmark('forinarow.score_position')
+def bench_score_position(repeat):
+    from forinarow import FourInARow
+    from forinarow_board import AI_PIECE
+    positions = four_positions()
+
+    def run():
+        for position in positions:
+            FourInARow.score_position(position, AI_PIECE)
+    return measure(run, 10000, repeat) / len(positions)
+
+
+def game_2048():
+    from py2048 import DveTysyachiSorokVosyem
+    return DveTysyachiSorokVosyem(pygame.display.get_surface())
+
+
+def boards_2048(count, full=False):
+    # Случайные поля 2048 в упакованном виде
+    import py2048_engine
+    rng = random.Random(2)
+    boards = []
+    for _ in range(count):
+        grid = [[(1 << rng.randint(1, 6)) if full or rng.random() < 0.6 else 0 for _ in range(4)]
+                for _ in range(4)]
+        boards.append(py2048_engine.encode(grid))
+    return boards
+
+
+@benchmark('py2048.make_move')
+def bench_make_move(repeat):
+    game = game_2048()
+    boards = boards_2048(100)
+
+    def run():
+        for board in boards:
+            for move in 'lrud':
+                game.board = board
+                game.make_move(move)
+    return measure(run, 5, repeat) / (4 * len(boards))
+
+
+@benchmark('py2048.is_game_over')
+def bench_is_game_over(repeat):
+    game = game_2048()
+    boards = boards_2048(100) + boards_2048(100, full=True)
+
+    def run():
+        for board in boards:
+            game.board = board
+            game.is_game_over()
+    return measure(run, 20, repeat) / len(boards)
+
+
+@benchmark('py2048.batch_step_10k')
+def bench_batch_step(repeat):
+    from py2048_batch import BatchGame
+    batch = BatchGame(10000, seed=3)
+    directions = np.random.default_rng(3).integers(0, 4, 10000)
+    return measure(lambda: batch.step(directions), 5, repeat)
+
+
+@benchmark('tetris.line_clear')
+def bench_line_clear(repeat):
+    from tetris_core import Field, Piece
+    # Четыре строки заполнены, кроме последнего столбца: вертикальная палка очищает их все
+    width, height = 10, 20
+    rows = [0] * (height - 4) + [(1 << (width - 1)) - 1] * 4
+    stick = Piece(0, 1, width - 1, height - 3)
+    cells = stick.cells()
+    field = Field(width, height)
+
+    def run():
+        field.rows = rows[:]
+        field.lock(cells, (255, 0, 0))
+    return measure(run, 1000, repeat)
+
+
+def tetris_game():
+    from tetris import Tetris
+    from tetris_bot import Bot
+    game = Tetris(pygame.display.get_surface(), seed=4)
+    # Поле с закрепленными фигурами, как в середине партии: первые фигуры расставляет бот
+    bot = Bot()
+    while game.game.pieces < 30 and not game.game.game_over:
+        choice = bot.choose(game.game)
+        if choice is not None:
+            for action in choice[1]:
+                game.game.step(action, 0)
+        game.game.step(tetris_core.HARD_DROP)
+    return game
+
+
+@benchmark('tetris.draw_full_frame')
+def bench_tetris_full_frame(repeat):
+    game = tetris_game()
+
+    def run():
+        game.redraw_all = True
+        game.draw('1000')
+    return measure(run, 20, repeat)
+
+
+@benchmark('tetris.draw_frame')
+def bench_tetris_frame(repeat):
+    # Обычный кадр: фигура сдвинулась, остальное уже на экране
+    game = tetris_game()
+    game.draw('1000')
+
+    def run():
+        game.game.figure = game.game.field.try_move(game.game.figure, dx=1) or \
+            game.game.field.try_move(game.game.figure, dx=-1) or game.game.figure
+        game.draw('1000')
+    return measure(run, 100, repeat)
+
+
+@benchmark('tetris.bot_choose')
+def bench_bot_choose(repeat):
+    from tetris_bot import Bot
+    game = tetris_game()
+    bot = Bot()
+    return measure(lambda: bot.choose(game.game), 20, repeat)
+
+
+@benchmark('menu.frame')
+def bench_menu_frame(repeat):
+    from MENU import Menu
+    menu = Menu()
+    return measure(menu.draw, 50, repeat)
+
+
+def profiled_frame(enabled, repeat):
+    # Отметки одного кадра тетриса: начало кадра и шесть фаз
+    from profiler import Profiler
+    profiler = Profiler()
+    profiler.enabled = enabled
+
+    def run():
+        profiler.frame()
+        for phase in ('draw', 'events', 'ai', 'logic', 'display', 'wait'):
+            profiler.lap(phase)
+    return measure(run, 10000, repeat)
+
+
+@benchmark('profiler.frame_disabled')
+def bench_profiler_disabled(repeat):
+    return profiled_frame(False, repeat)
+
+
+@benchmark('profiler.frame_enabled')
+def bench_profiler_enabled(repeat):
+    return profiled_frame(True, repeat)
+
+
+def run_benchmarks(names, repeat, log=print):
+    pygame.init()
+    pygame.display.set_mode((400, 500))
+    results = {}
+    for name in names:
+        results[name] = BENCHMARKS[name](repeat)
+        log("{:32} {:>12}".format(name, format_time(results[name])))
+    return results
+
+
+def format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return "{:.2f} {}".format(seconds / scale, unit)
+    return "{:.0f} ns".format(seconds / 1e-9)
+
+
+def load_baseline(path):
+    # Результаты из файла, сохраненного с --save, или None, если файла нет или он не читается
+    try:
+        with open(path) as fil:
+            return dict(json.load(fil)['results'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def compare(baseline, results, threshold):
+    # Сравнение с базовыми результатами, возвращает список замедлившихся замеров
+    regressions = []
+    for name, seconds in results.items():
+        if name not in baseline:
+            continue
+        change = seconds / baseline[name] - 1
+        mark = ''
+        if change > threshold:
+            mark = '  REGRESSION'
+            regressions.append(name)
+        print("{:32} {:>12} -> {:>12} {:+7.1%}{}".format(name, format_time(baseline[name]),
+                                                        format_time(seconds), change, mark))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Замеры скорости игр без окна")
+    parser.add_argument('-k', dest='filter', default='', help="только замеры, в имени которых есть подстрока")
+    parser.add_argument('--repeat', type=int, default=5, help="число повторений, берется лучшее")
+    parser.add_argument('--save', nargs='?', const=BASELINE_PATH, help="сохранить результаты как базовые")
+    parser.add_argument('--compare', nargs='?', const=BASELINE_PATH, help="сравнить с базовыми результатами")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help="допустимый рост времени (0.1 - на 10%%)")
+    args = parser.parse_args()
+
+    # Базовые результаты читаются до замеров, чтобы не ждать их впустую
+    baseline = None
+    if args.compare:
+        baseline = load_baseline(args.compare)
+        if baseline is None:
+            print("no baseline in {}: save one first with --save {}".format(args.compare, args.compare))
+            sys.exit(2)
+
+    names = [name for name in BENCHMARKS if args.filter in name]
+    results = run_benchmarks(names, args.repeat)
+
+    if args.save:
+        with open(args.save, 'w') as fil:
+            json.dump({'python': sys.version.split()[0], 'platform': platform.platform(),
+                       'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'results': results}, fil, indent=2)
+        print("saved to {}".format(args.save))
+
+    if baseline is not None:
+        print()
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print("{} regression(s) above {:.0%}".format(len(regressions), args.threshold))
+            sys.exit(1)
@@ -1,12 +1,13 @@
 import math
+import os
 import random
 import sys
 import numpy as np
 import pygame
-import music
-
-# Инициализация Pygame
-pygame.init()
+from forinarow_board import Position, evaluate_counts, EMPTY, PLAYER_PIECE, AI_PIECE, WINDOW_LENGTH
+from forinarow_search import Searcher, ParallelSearcher, SearchWorker
+from forinarow_book import OpeningBook
+from profiler import profiler
 
 # Определяем цвета для игрового интерфейса
 BLUE = pygame.Color('blue')
@@ -14,15 +15,12 @@ BLACK = pygame.Color('black')
 RED = pygame.Color('red')
 YELLOW = pygame.Color('yellow')
 
-# Константы для игроков и типа ячейки
+# Константы для игроков
 PLAYER = 0
 AI = 1
-EMPTY = 0
-PLAYER_PIECE = 1
-AI_PIECE = 2
 
-# Длина окна для победного условия
-WINDOW_LENGTH = 4
+# Направления линий: горизонталь, вертикаль и две диагонали
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
 
 # Размер клетки
 SQUARESIZE = 100
@@ -30,15 +28,29 @@ RADIUS = int(SQUARESIZE / 2 - 5)
 
 
 class FourInARow:
-    def __init__(self, row_count, col_count):
+    def __init__(self, row_count, col_count, time_budget=1.0, max_depth=None, workers=1):
         # Инициализация игры с заданным количеством рядов и колонок.
+        # time_budget - время на ход компьютера в секундах, max_depth - предельная глубина поиска,
+        # workers - число процессов для параллельного поиска (1 - поиск в одном потоке, None - по числу ядер)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError("workers должно быть не меньше 1")
         self.row_count = row_count
         self.col_count = col_count
         self.width = col_count * SQUARESIZE
         self.height = (row_count + 1) * SQUARESIZE  # Дополнительный ряд для отображения хода
         self.size = (self.width, self.height)
         self.screen = pygame.display.set_mode(self.size)  # Создаем экран
-        self.board = self.create_board()  # Создаем игровую доску
+        self.board = self.create_board()  # Доска для отрисовки
+        self.position = Position(row_count, col_count)  # Битовая доска, на которой работает поиск
+        # Поиск хранит таблицу транспозиций, общую для всех ходов этой партии
+        self.searcher = ParallelSearcher(workers) if workers > 1 else Searcher()
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.move_stats = []  # Статистика поиска по каждому ходу компьютера
+        # Книга дебютов, файл открывается только при первом обращении
+        self.book = OpeningBook()
         self.draw_board(self.board)  # Отрисовываем доску
         pygame.display.set_caption("FourInARow")  # Устанавливаем заголовок окна
         programicon = pygame.image.load('icons/4inarow.png')  # Загружаем иконку
@@ -64,157 +76,60 @@ class FourInARow:
             if board[r][col] == 0:
                 return r
 
-    def winning_move(self, board, piece):
-        # Проверка победного условия для горизонталей, вертикалей и диагоналей
-        # Проверка горизонтальных победных комбинаций
-        for c in range(self.col_count - 3):
-            for r in range(self.row_count):
-                if all([board[r][c + i] == piece for i in range(4)]):
-                    return True
-
-        # Проверка вертикальных победных комбинаций
-        for c in range(self.col_count):
-            for r in range(self.row_count - 3):
-                if all([board[r + i][c] == piece for i in range(4)]):
-                    return True
-
-        # Проверка диагональных победных комбинаций (слева направо)
-        for c in range(self.col_count - 3):
-            for r in range(self.row_count - 3):
-                if all([board[r + i][c + i] == piece for i in range(4)]):
-                    return True
-
-        # Проверка диагональных победных комбинаций (справа налево)
-        for c in range(self.col_count - 3):
-            for r in range(3, self.row_count):
-                if all([board[r - i][c + i] == piece for i in range(4)]):
-                    return True
+    @staticmethod
+    def winning_move(board, piece):
+        # Проверка победного условия для горизонталей, вертикалей и диагоналей.
+        # Все окна проверяются сразу: доска сдвигается на 0..3 клетки вдоль направления
+        # и сдвинутые маски перемножаются; работает для доски любого размера.
+        rows, cols = board.shape
+        mask = board == piece
+        n = WINDOW_LENGTH - 1
+        for dr, dc in DIRECTIONS:
+            r0, r1 = max(0, -dr * n), rows - max(0, dr * n)
+            c0, c1 = max(0, -dc * n), cols - max(0, dc * n)
+            if r1 <= r0 or c1 <= c0:
+                continue
+            lines = mask[r0:r1, c0:c1]
+            for i in range(1, WINDOW_LENGTH):
+                lines = lines & mask[r0 + dr * i:r1 + dr * i, c0 + dc * i:c1 + dc * i]
+            if lines.any():
+                return True
+        return False
 
     @staticmethod
     def evaluate_window(window, piece):
         # Оценка очков для конкретного окна (подматрицы)
-        score = 0
         opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
+        return evaluate_counts(window.count(piece), window.count(opp_piece))
 
-        # Добавляем очки за комбинации (4 подряд, 3 подряд, 2 подряд)
-        if window.count(piece) == 4:
-            score += 100
-        elif window.count(piece) == 3 and window.count(EMPTY) == 1:
-            score += 5
-        elif window.count(piece) == 2 and window.count(EMPTY) == 2:
-            score += 2
-
-        # Уменьшаем очки за комбинацию из 3 подряд для противника
-        if window.count(opp_piece) == 3 and window.count(EMPTY) == 1:
-            score -= 4
-
-        return score
-
-    def score_position(self, board, piece):
+    @staticmethod
+    def score_position(position, piece):
         # Оцениваем всю доску для выбора оптимального хода
-        score = 0
+        return position.score(piece)
 
-        # Оценка центральной колонки для дополнительного приоритета
-        center_array = [int(i) for i in list(board[:, self.col_count // 2])]
-        center_count = center_array.count(piece)
-        score += center_count * 3
+    @staticmethod
+    def is_terminal_node(position):
+        # Проверка, завершена ли игра (победа или ничья)
+        return position.is_winning(PLAYER_PIECE) or position.is_winning(AI_PIECE) or position.is_full()
 
-        # Оценка по горизонтали
-        for r in range(self.row_count):
-            row_array = [int(i) for i in list(board[r, :])]
-            for c in range(self.col_count - 3):
-                window = row_array[c:c + WINDOW_LENGTH]
-                score += self.evaluate_window(window, piece)
+    def minimax(self, position, depth, alpha, beta, maximizing_player):
+        # Алгоритм Минимакс для выбора оптимального хода (поиск на фиксированную глубину)
+        return self.searcher.minimax(position, depth, alpha, beta, maximizing_player)
 
-        # Оценка по вертикали
-        for c in range(self.col_count):
-            col_array = [int(i) for i in list(board[:, c])]
-            for r in range(self.row_count - 3):
-                window = col_array[r:r + WINDOW_LENGTH]
-                score += self.evaluate_window(window, piece)
-
-        # Оценка по диагоналям (слева направо)
-        for r in range(self.row_count - 3):
-            for c in range(self.col_count - 3):
-                window = [board[r + i][c + i] for i in range(WINDOW_LENGTH)]
-                score += self.evaluate_window(window, piece)
-
-        # Оценка по диагоналям (справа налево)
-        for r in range(self.row_count - 3):
-            for c in range(self.col_count - 3):
-                window = [board[r + 3 - i][c + i] for i in range(WINDOW_LENGTH)]
-                score += self.evaluate_window(window, piece)
-
-        return score
-
-    def is_terminal_node(self, board):
-        # Проверка, завершена ли игра (победа или ничья)
-        return self.winning_move(board, PLAYER_PIECE) or \
-            self.winning_move(board, AI_PIECE) or len(self.get_valid_locations(board)) == 0
-
-    def minimax(self, board, depth, alpha, beta, maximizing_player):
-        # Алгоритм Минимакс для выбора оптимального хода
-        valid_locations = self.get_valid_locations(board)
-        is_terminal = self.is_terminal_node(board)
-        if depth == 0 or is_terminal:
-            if is_terminal:
-                if self.winning_move(board, AI_PIECE):
-                    return None, 100000000000000
-                elif self.winning_move(board, PLAYER_PIECE):
-                    return None, -10000000000000
-                else:
-                    return None, 0
-            else:
-                return None, self.score_position(board, AI_PIECE)
-        if maximizing_player:
-            value = -math.inf
-            column = random.choice(valid_locations)
-            for col in valid_locations:
-                row = self.get_next_open_row(board, col)
-                b_copy = board.copy()
-                self.drop_piece(b_copy, row, col, AI_PIECE)
-                new_score = self.minimax(b_copy, depth - 1, alpha, beta, False)[1]
-                if new_score > value:
-                    value = new_score
-                    column = col
-                alpha = max(alpha, value)
-                if alpha >= beta:
-                    break
-            return column, value
-        else:
-            value = math.inf
-            column = random.choice(valid_locations)
-            for col in valid_locations:
-                row = self.get_next_open_row(board, col)
-                b_copy = board.copy()
-                self.drop_piece(b_copy, row, col, PLAYER_PIECE)
-                new_score = self.minimax(b_copy, depth - 1, alpha, beta, True)[1]
-                if new_score < value:
-                    value = new_score
-                    column = col
-                beta = min(beta, value)
-                if alpha >= beta:
-                    break
-            return column, value
-
-    def get_valid_locations(self, board):
+    @staticmethod
+    def get_valid_locations(position):
         # Возвращаем список доступных колонок для хода
-        valid_locations = []
-        for col in range(self.col_count):
-            if self.is_valid_location(board, col):
-                valid_locations.append(col)
-        return valid_locations
+        return position.valid_moves()
 
-    def pick_best_move(self, board, piece):
+    def pick_best_move(self, position, piece):
         # Определяем наилучший ход, проверяя все доступные ходы
-        valid_locations = self.get_valid_locations(board)
+        valid_locations = position.valid_moves()
         best_score = -10000
         best_col = random.choice(valid_locations)
         for col in valid_locations:
-            row = self.get_next_open_row(board, col)
-            temp_board = board.copy()
-            self.drop_piece(temp_board, row, col, piece)
-            score = self.score_position(temp_board, piece)
+            position.play(col, piece)
+            score = self.score_position(position, piece)
+            position.undo()
             if score > best_score:
                 best_score = score
                 best_col = col
@@ -237,17 +152,36 @@ class FourInARow:
         pygame.display.update()
 
 
+    def draw_thinking(self):
+        # Индикатор "компьютер думает" в верхней строке окна
+        top = pygame.Rect(0, 0, self.width, SQUARESIZE)
+        pygame.draw.rect(self.screen, BLACK, top)
+        dots = "." * (pygame.time.get_ticks() // 300 % 4)
+        label = self.thinking_font.render("Думаю" + dots, True, YELLOW)
+        self.screen.blit(label, (20, (SQUARESIZE - label.get_height()) // 2))
+        pygame.display.update(top)
+
     def start(self):  # основной цикл
+        # Возвращает победителя (PLAYER_PIECE или AI_PIECE), EMPTY при ничьей или None, если игра прервана
         pygame.display.update()
         game_over = False
+        winner = None
         running = True
         myfont = pygame.font.SysFont("monospace", 75)
+        self.thinking_font = pygame.font.SysFont("monospace", 40)
+        clock = pygame.time.Clock()
+        # Ход компьютера считается в фоновом потоке, окно при этом продолжает отвечать
+        worker = SearchWorker(self.searcher)
 
         turn = random.randint(PLAYER, AI)
 
+        profiler.section('forinarow')
         while not game_over and running:
+            profiler.frame()
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
+                    worker.cancel()
+                    self.searcher.close()
                     sys.exit()
 
                 if event.type == pygame.MOUSEMOTION:  # отрисовываем шарик, который собираемся бросать
@@ -264,14 +198,19 @@ class FourInARow:
                         posx = event.pos[0]
                         col = int(math.floor(posx / SQUARESIZE))
 
-                        if self.is_valid_location(self.board, col):
-                            row = self.get_next_open_row(self.board, col)
+                        if self.position.can_play(col):
+                            row = self.position.play(col, PLAYER_PIECE)
                             self.drop_piece(self.board, row, col, PLAYER_PIECE)
 
-                            if self.winning_move(self.board, PLAYER_PIECE):
+                            # Выиграть мог только тот, кто сейчас походил
+                            if self.position.last_move_won():
                                 label = myfont.render("Красный победил!", True, RED)
                                 self.screen.blit(label, (40, 10))
                                 game_over = True
+                                winner = PLAYER_PIECE
+                            elif self.position.is_full():
+                                game_over = True
+                                winner = EMPTY
 
                             turn += 1
                             turn = turn % 2
@@ -279,29 +218,67 @@ class FourInARow:
                             self.draw_board(self.board)
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_ESCAPE:
+                        # Прерываем поиск сразу, не дожидаясь его окончания
+                        worker.cancel()
                         running = False
-                        with open("game_end.txt", "w+") as fil:
-                            fil.write("1")
                         break
-                if event.type == music.STOPPED_PLAYING:
-                    music.play_music()
+                if profiler.handle_event(event):
+                    # Панель профайлера спрятана - стираем ее с верхней строки
+                    pygame.draw.rect(self.screen, BLACK, (0, 0, self.width, SQUARESIZE))
+                    pygame.display.update()
+            profiler.lap('events')
             if running:
                 if turn == AI and not game_over:  # компьютер делает ход
-                    col, minimax_score = self.minimax(self.board, 5, -math.inf, math.inf, True)
-
-                    if self.is_valid_location(self.board, col):
-                        row = self.get_next_open_row(self.board, col)
+                    result = worker.take_result()
+                    if result is None and not worker.busy():
+                        # Сначала ищем ход в книге дебютов, поиск - только если позиции в ней нет
+                        book_col = self.book.best_move(self.position, AI_PIECE)
+                        if book_col is not None:
+                            result = book_col, None
+                            pygame.display.set_caption("FourInARow: opening book")
+                        else:
+                            worker.start(self.position, self.time_budget, self.max_depth)
+                    elif result is not None:
+                        self.move_stats.append(self.searcher.stats)
+                        pygame.display.set_caption("FourInARow: {}".format(self.searcher.stats))
+
+                    if result is None:
+                        self.draw_thinking()
+                    else:
+                        col, minimax_score = result
+                        pygame.draw.rect(self.screen, BLACK, (0, 0, self.width, SQUARESIZE))
+
+                        row = self.position.play(col, AI_PIECE)
                         self.drop_piece(self.board, row, col, AI_PIECE)
 
-                        if self.winning_move(self.board, AI_PIECE):
+                        if self.position.last_move_won():
                             label = myfont.render("Желтый победил!", True, YELLOW)
                             self.screen.blit(label, (40, 10))
                             game_over = True
+                            winner = AI_PIECE
+                        elif self.position.is_full():
+                            game_over = True
+                            winner = EMPTY
 
                         self.draw_board(self.board)
 
                         turn += 1
                         turn = turn % 2
 
+                profiler.lap('ai')
+
                 if game_over:
                     pygame.time.wait(3000)
+
+            hud = profiler.draw_hud(self.screen)
+            if hud:
+                pygame.display.update(hud)
+            profiler.lap('draw')
+            # Постоянная частота кадров, пока компьютер думает
+            clock.tick(60)
+            profiler.lap('wait')
+
+        # Останавливаем процессы параллельного поиска, если они были
+        self.searcher.close()
+        self.book.close()
+        return winner
@@ -0,0 +1,253 @@
+import random
+from functools import lru_cache
+
+# Константы для типа ячейки
+EMPTY = 0
+PLAYER_PIECE = 1
+AI_PIECE = 2
+
+# Длина окна для победного условия
+WINDOW_LENGTH = 4
+
+
+@lru_cache(maxsize=None)
+def board_geometry(row_count, col_count):
+    # Общие для всех позиций маски доски заданного размера.
+    # Столбец c занимает биты c * (row_count + 1) ... c * (row_count + 1) + row_count - 1,
+    # верхний бит столбца всегда пустой (сторожевой) и не дает сдвигам "перескакивать" между столбцами.
+    stride = row_count + 1
+    bottom_mask = 0
+    for c in range(col_count):
+        bottom_mask |= 1 << (c * stride)
+    board_mask = bottom_mask * ((1 << row_count) - 1)
+    center_mask = ((1 << row_count) - 1) << (col_count // 2 * stride)
+
+    # Все окна из четырех клеток: горизонтали, вертикали и обе диагонали
+    windows = []
+    for r in range(row_count):
+        for c in range(col_count - 3):
+            windows.append(sum(1 << ((c + i) * stride + r) for i in range(WINDOW_LENGTH)))
+    for c in range(col_count):
+        for r in range(row_count - 3):
+            windows.append(sum(1 << (c * stride + r + i) for i in range(WINDOW_LENGTH)))
+    for r in range(row_count - 3):
+        for c in range(col_count - 3):
+            windows.append(sum(1 << ((c + i) * stride + r + i) for i in range(WINDOW_LENGTH)))
+    for r in range(row_count - 3):
+        for c in range(col_count - 3):
+            windows.append(sum(1 << ((c + i) * stride + r + 3 - i) for i in range(WINDOW_LENGTH)))
+
+    # Сдвиги для вертикали, горизонтали и двух диагоналей
+    shifts = (1, stride, stride - 1, stride + 1)
+    return stride, bottom_mask, board_mask, center_mask, tuple(windows), shifts
+
+
+@lru_cache(maxsize=None)
+def zobrist_keys(row_count, col_count):
+    # Случайные 64-битные ключи Зобриста для каждой фишки в каждой клетке.
+    # Генератор с фиксированным зерном, чтобы хеши совпадали между запусками и процессами.
+    rng = random.Random(0x4F52)
+    size = (row_count + 1) * col_count
+    return tuple(tuple(rng.getrandbits(64) for _ in range(size)) for _ in range(AI_PIECE + 1))
+
+
+def evaluate_counts(piece_count, opp_count):
+    # Оценка окна по числу своих и чужих фишек в нем
+    score = 0
+    empty_count = WINDOW_LENGTH - piece_count - opp_count
+
+    # Добавляем очки за комбинации (4 подряд, 3 подряд, 2 подряд)
+    if piece_count == 4:
+        score += 100
+    elif piece_count == 3 and empty_count == 1:
+        score += 5
+    elif piece_count == 2 and empty_count == 2:
+        score += 2
+
+    # Уменьшаем очки за комбинацию из 3 подряд для противника
+    if opp_count == 3 and empty_count == 1:
+        score -= 4
+
+    return score
+
+
+# Изменение оценки окна, когда в него добавляется своя фишка (OWN_DELTA) или чужая (OPP_DELTA):
+# OWN_DELTA[m][o] = оценка(m + 1, o) - оценка(m, o), OPP_DELTA[m][o] = оценка(m, o + 1) - оценка(m, o)
+OWN_DELTA = [[evaluate_counts(m + 1, o) - evaluate_counts(m, o) if m + o < WINDOW_LENGTH else 0
+              for o in range(WINDOW_LENGTH + 1)] for m in range(WINDOW_LENGTH + 1)]
+OPP_DELTA = [[evaluate_counts(m, o + 1) - evaluate_counts(m, o) if m + o < WINDOW_LENGTH else 0
+              for o in range(WINDOW_LENGTH + 1)] for m in range(WINDOW_LENGTH + 1)]
+
+
+@lru_cache(maxsize=None)
+def window_tables(row_count, col_count):
+    # Для каждой клетки (номера бита) - список окон, которые через нее проходят,
+    # и бонус за центральный столбец
+    stride, _, _, _, windows, _ = board_geometry(row_count, col_count)
+    cell_windows = []
+    cell_bonus = []
+    for bit in range(stride * col_count):
+        cell_windows.append(tuple(w for w, window in enumerate(windows) if window >> bit & 1))
+        cell_bonus.append(3 if bit // stride == col_count // 2 else 0)
+    return tuple(cell_windows), tuple(cell_bonus), len(windows)
+
+
+class IncrementalEvaluator:
+    # Хранит число фишек каждого игрока в каждом окне и текущую оценку позиции
+    # для обоих игроков. Ход или отмена хода пересчитывают только окна через
+    # изменившуюся клетку (не больше 16), поэтому оценка листа - просто чтение числа.
+    # Веса те же, что в evaluate_counts: 100/5/2/-4 и 3 за центральный столбец.
+    def __init__(self, row_count, col_count):
+        self.cell_windows, self.cell_bonus, window_count = window_tables(row_count, col_count)
+        self.counts = [None, [0] * window_count, [0] * window_count]
+        self.scores = [0, 0, 0]
+
+    def copy(self):
+        other = IncrementalEvaluator.__new__(IncrementalEvaluator)
+        other.cell_windows, other.cell_bonus = self.cell_windows, self.cell_bonus
+        other.counts = [None, self.counts[1][:], self.counts[2][:]]
+        other.scores = self.scores[:]
+        return other
+
+    def add(self, bit, piece):
+        # Фишка piece появилась в клетке bit
+        opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
+        mine = self.counts[piece]
+        theirs = self.counts[opp_piece]
+        gain = self.cell_bonus[bit]
+        loss = 0
+        for w in self.cell_windows[bit]:
+            m, o = mine[w], theirs[w]
+            gain += OWN_DELTA[m][o]
+            loss += OPP_DELTA[o][m]
+            mine[w] = m + 1
+        self.scores[piece] += gain
+        self.scores[opp_piece] += loss
+
+    def remove(self, bit, piece):
+        # Фишка piece убрана из клетки bit (обратное к add)
+        opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
+        mine = self.counts[piece]
+        theirs = self.counts[opp_piece]
+        gain = self.cell_bonus[bit]
+        loss = 0
+        for w in self.cell_windows[bit]:
+            m, o = mine[w] - 1, theirs[w]
+            gain += OWN_DELTA[m][o]
+            loss += OPP_DELTA[o][m]
+            mine[w] = m
+        self.scores[piece] -= gain
+        self.scores[opp_piece] -= loss
+
+
+class Position:
+    # Позиция "4 в ряд" в виде битовых масок: по маске на каждого игрока и высоты столбцов.
+    # Для стандартной доски 6x7 маски укладываются в 49 бит, большие доски работают так же
+    # за счет длинной арифметики Python.
+    def __init__(self, row_count, col_count):
+        self.row_count = row_count
+        self.col_count = col_count
+        (self.stride, self.bottom_mask, self.board_mask,
+         self.center_mask, self.windows, self.shifts) = board_geometry(row_count, col_count)
+        self.zobrist = zobrist_keys(row_count, col_count)
+
+        # Маски фишек, индексируются номером фишки (PLAYER_PIECE / AI_PIECE)
+        self.masks = [0, 0, 0]
+        self.occupied = 0
+        # Номер следующего свободного бита в каждом столбце и номер сторожевого бита
+        self.heights = [c * self.stride for c in range(col_count)]
+        self.tops = [c * self.stride + row_count for c in range(col_count)]
+        # История ходов (столбец, фишка) для отмены
+        self.history = []
+        # Хеш Зобриста, обновляется при каждом ходе и отмене
+        self.hash = 0
+        # Оценка позиции, обновляется при каждом ходе и отмене
+        self.evaluator = IncrementalEvaluator(row_count, col_count)
+
+    def copy(self):
+        # Независимая копия позиции
+        other = Position.__new__(Position)
+        other.__dict__.update(self.__dict__)
+        other.masks = self.masks[:]
+        other.heights = self.heights[:]
+        other.history = self.history[:]
+        other.evaluator = self.evaluator.copy()
+        return other
+
+    def can_play(self, col):
+        # Можно ли сделать ход в столбец (столбец не заполнен)
+        return self.heights[col] < self.tops[col]
+
+    def play(self, col, piece):
+        # Бросаем фишку в столбец, возвращаем номер строки, куда она упала
+        bit = self.heights[col]
+        self.masks[piece] |= 1 << bit
+        self.occupied |= 1 << bit
+        self.heights[col] = bit + 1
+        self.history.append((col, piece))
+        self.hash ^= self.zobrist[piece][bit]
+        self.evaluator.add(bit, piece)
+        return bit - col * self.stride
+
+    def undo(self):
+        # Отменяем последний ход, возвращаем его столбец
+        col, piece = self.history.pop()
+        bit = self.heights[col] - 1
+        self.masks[piece] ^= 1 << bit
+        self.occupied ^= 1 << bit
+        self.heights[col] = bit
+        self.hash ^= self.zobrist[piece][bit]
+        self.evaluator.remove(bit, piece)
+        return col
+
+    def possible_mask(self):
+        # Маска клеток, в которые можно бросить фишку следующим ходом
+        return (self.occupied + self.bottom_mask) & self.board_mask
+
+    def valid_moves(self):
+        # Список доступных для хода столбцов
+        return [c for c in range(self.col_count) if self.heights[c] < self.tops[c]]
+
+    def is_full(self):
+        return len(self.history) == self.row_count * self.col_count
+
+    def is_winning(self, piece):
+        # Есть ли у игрока четыре в ряд хотя бы в одном направлении
+        mask = self.masks[piece]
+        for shift in self.shifts:
+            pairs = mask & (mask >> shift)
+            if pairs & (pairs >> (2 * shift)):
+                return True
+        return False
+
+    def score(self, piece):
+        # Эвристическая оценка позиции с точки зрения игрока piece
+        return self.evaluator.scores[piece]
+
+    def full_score(self, piece):
+        # Та же оценка, посчитанная заново по всем окнам (для проверки инкрементальной)
+        opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
+        mine = self.masks[piece]
+        theirs = self.masks[opp_piece]
+
+        # Оценка центральной колонки для дополнительного приоритета
+        score = (mine & self.center_mask).bit_count() * 3
+
+        # Оценка всех окон: горизонтали, вертикали и диагонали
+        for window in self.windows:
+            score += evaluate_counts((mine & window).bit_count(), (theirs & window).bit_count())
+
+        return score
+
+    def last_move_won(self):
+        # Четыре в ряд могли появиться только у того, кто ходил последним
+        return bool(self.history) and self.is_winning(self.history[-1][1])
+
+    def cell(self, row, col):
+        # Фишка в клетке (EMPTY, если клетка пустая)
+        bit = 1 << (col * self.stride + row)
+        if self.masks[PLAYER_PIECE] & bit:
+            return PLAYER_PIECE
+        if self.masks[AI_PIECE] & bit:
+            return AI_PIECE
+        return EMPTY
@@ -0,0 +1,371 @@
+import argparse
+import mmap
+import os
+import struct
+import time
+
+from forinarow_board import board_geometry, PLAYER_PIECE, AI_PIECE
+
+# Книга дебютов по умолчанию
+BOOK_PATH = 'data/forinarow_book.bin'
+
+# Формат файла книги:
+#   заголовок (16 байт): сигнатура, версия, число рядов, столбцов, полуходов, число ячеек,
+#   первый полуход в книге (позиции раньше него не решались);
+#   таблица из slot_count 64-битных ячеек (little endian) с открытой адресацией.
+# Ячейка хранит (ключ << 8) | (оценка + 128), пустая ячейка - ноль.
+# Ключ позиции - current + mask (как у решателя Паскаля Понса), из позиции и ее
+# зеркального отражения хранится меньший ключ.
+BOOK_MAGIC = b'C4BK'
+BOOK_VERSION = 1
+HEADER = struct.Struct('<4sBBBBIB3x')
+SLOT = struct.Struct('<Q')
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+
+# Известные оценки дебютных позиций (столбцы ходов с нуля -> оценка для игрока, который ходит).
+# Поле 6x7 решено (Аллис, 1988): первый игрок выигрывает последним камнем, если ходит в центр.
+# Решатель на Python эти позиции за разумное время не решает
+KNOWN_SCORES = {
+    (6, 7): {'': 1, '0': 2, '1': 1, '2': 0, '3': -1, '4': 0, '5': 1, '6': 2},
+}
+
+
+def mirror_key(key, row_count, col_count):
+    # Зеркальное отражение ключа относительно центрального столбца
+    stride = row_count + 1
+    column = (1 << stride) - 1
+    mirrored = 0
+    for c in range(col_count):
+        mirrored |= ((key >> (c * stride)) & column) << ((col_count - 1 - c) * stride)
+    return mirrored
+
+
+def book_slot(key, slot_count):
+    # Первая ячейка для ключа (slot_count - степень двойки)
+    return ((key * HASH_MULTIPLIER) & 0xFFFFFFFFFFFFFFFF) >> 32 & (slot_count - 1)
+
+
+class Solver:
+    # Точный решатель "4 в ряд": негамакс с альфа-бета отсечением на битовой доске,
+    # поиском с нулевым окном и таблицей транспозиций (верхние и нижние границы).
+    # Оценка считается для игрока, который ходит: положительная - он выигрывает,
+    # и тем больше, чем раньше; 0 - ничья.
+    def __init__(self, row_count, col_count, tt_size=1 << 20):
+        self.row_count = row_count
+        self.col_count = col_count
+        self.stride, self.bottom_mask, self.board_mask, _, _, _ = board_geometry(row_count, col_count)
+        self.cells = row_count * col_count
+        self.min_score = -(self.cells // 2) + 3
+        self.max_score = (self.cells + 1) // 2 - 3
+        self.column_masks = [((1 << row_count) - 1) << (c * self.stride) for c in range(col_count)]
+        # Столбцы от центра к краям
+        center = col_count // 2
+        self.order = sorted(range(col_count), key=lambda c: abs(c - center))
+        self.tt_size = tt_size
+        self.tt_keys = [0] * tt_size
+        self.tt_values = [0] * tt_size
+        self.nodes = 0
+
+    def winning_cells(self, position, mask):
+        # Пустые клетки, занятие которых дает игроку четыре в ряд
+        r = (position << 1) & (position << 2) & (position << 3)
+        for s in (self.stride, self.stride - 1, self.stride + 1):
+            p = (position << s) & (position << (2 * s))
+            r |= p & (position << (3 * s))
+            r |= p & (position >> s)
+            p = (position >> s) & (position >> (2 * s))
+            r |= p & (position << s)
+            r |= p & (position >> (3 * s))
+        return r & (self.board_mask ^ mask)
+
+    def possible(self, mask):
+        return (mask + self.bottom_mask) & self.board_mask
+
+    def non_losing_moves(self, current, mask):
+        # Ходы, после которых соперник не выигрывает сразу
+        possible = self.possible(mask)
+        opponent_win = self.winning_cells(current ^ mask, mask)
+        forced = possible & opponent_win
+        if forced:
+            if forced & (forced - 1):
+                return 0  # две угрозы соперника закрыть нельзя
+            possible = forced
+        return possible & ~(opponent_win >> 1)
+
+    def negamax(self, current, mask, moves, alpha, beta):
+        self.nodes += 1
+        candidates = self.non_losing_moves(current, mask)
+        if not candidates:
+            return -((self.cells - moves) // 2)
+        if moves >= self.cells - 2:
+            return 0
+
+        # Границы оценки по числу оставшихся ходов
+        lower = -((self.cells - 2 - moves) // 2)
+        if alpha < lower:
+            alpha = lower
+            if alpha >= beta:
+                return alpha
+        upper = (self.cells - 1 - moves) // 2
+        if beta > upper:
+            beta = upper
+            if alpha >= beta:
+                return beta
+
+        # Границы из таблицы транспозиций (0 - пустая запись)
+        key = current + mask
+        index = key % self.tt_size
+        value = self.tt_values[index] if self.tt_keys[index] == key else 0
+        if value > self.max_score - self.min_score + 1:
+            lower = value + 2 * self.min_score - self.max_score - 2
+            if alpha < lower:
+                alpha = lower
+                if alpha >= beta:
+                    return alpha
+        elif value:
+            upper = value + self.min_score - 1
+            if beta > upper:
+                beta = upper
+                if alpha >= beta:
+                    return beta
+
+        # Сначала ходы, создающие больше собственных угроз
+        ordered = []
+        for c in self.order:
+            move = candidates & self.column_masks[c]
+            if move:
+                threats = self.winning_cells(current | move, mask).bit_count()
+                ordered.append((-threats, len(ordered), move))
+        ordered.sort()
+
+        for _, _, move in ordered:
+            score = -self.negamax(current ^ mask, mask | move, moves + 1, -beta, -alpha)
+            if score >= beta:
+                self.tt_keys[index] = key
+                self.tt_values[index] = score + self.max_score - 2 * self.min_score + 2
+                return score
+            if score > alpha:
+                alpha = score
+        self.tt_keys[index] = key
+        self.tt_values[index] = alpha - self.min_score + 1
+        return alpha
+
+    def solve(self, current, mask, moves):
+        # Точная оценка позиции итеративным поиском с нулевым окном
+        if self.winning_cells(current, mask) & self.possible(mask):
+            return (self.cells + 1 - moves) // 2
+        low = -((self.cells - moves) // 2)
+        high = (self.cells + 1 - moves) // 2
+        while low < high:
+            # Окно сдвигается к нулю, чтобы быстрее находить исход
+            middle = low + (high - low) // 2
+            if middle <= 0 and int(low / 2) < middle:
+                middle = int(low / 2)
+            elif middle >= 0 and high // 2 > middle:
+                middle = high // 2
+            result = self.negamax(current, mask, moves, middle, middle + 1)
+            if result <= middle:
+                high = result
+            else:
+                low = result
+        return low
+
+
+class OpeningBook:
+    # Книга дебютов на диске. Файл открывается через mmap только при первом
+    # обращении, читается лишь заголовок; поиск позиции - хеш и несколько чтений по 8 байт.
+    def __init__(self, path=BOOK_PATH):
+        self.path = path
+        self.mm = None
+        self.loaded = False  # была ли попытка открыть файл
+        self.row_count = self.col_count = self.plies = self.slot_count = self.first_ply = 0
+
+    def load(self):
+        self.loaded = True
+        try:
+            with open(self.path, 'rb') as fil:
+                mm = mmap.mmap(fil.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return
+        try:
+            magic, version, self.row_count, self.col_count, self.plies, self.slot_count, self.first_ply = \
+                HEADER.unpack_from(mm, 0)
+        except struct.error:
+            # Файл короче заголовка
+            mm.close()
+            return
+        if magic != BOOK_MAGIC or version != BOOK_VERSION or \
+                len(mm) != HEADER.size + self.slot_count * SLOT.size:
+            mm.close()
+            return
+        self.mm = mm
+
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+
+    def lookup(self, current, mask):
+        # Оценка позиции для игрока, который ходит, или None, если позиции нет в книге
+        key = current + mask
+        key = min(key, mirror_key(key, self.row_count, self.col_count))
+        slot = book_slot(key, self.slot_count)
+        while True:
+            value = SLOT.unpack_from(self.mm, HEADER.size + slot * SLOT.size)[0]
+            if not value:
+                return None
+            if value >> 8 == key:
+                return (value & 0xFF) - 128
+            slot = (slot + 1) & (self.slot_count - 1)
+
+    def best_move(self, position, piece):
+        # Лучший ход игрока piece по книге или None, если книга не подходит к позиции
+        if not self.loaded:
+            self.load()
+        # Оценки нужны для позиций после хода, поэтому они должны лежать между first_ply и plies
+        if self.mm is None or position.row_count != self.row_count or \
+                position.col_count != self.col_count or \
+                not self.first_ply <= len(position.history) + 1 <= self.plies:
+            return None
+
+        opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
+        center = position.col_count // 2
+        best_col, best_score = None, None
+        for col in sorted(position.valid_moves(), key=lambda c: abs(c - center)):
+            position.play(col, piece)
+            if position.is_winning(piece):
+                position.undo()
+                return col
+            # После хода ходит соперник, его оценка берется с обратным знаком
+            score = self.lookup(position.masks[opp_piece], position.occupied)
+            position.undo()
+            if score is None:
+                return None
+            if best_score is None or -score > best_score:
+                best_col, best_score = col, -score
+        return best_col
+
+
+def book_levels(solver, plies, first_ply=0):
+    # Позиции (current, mask) с first_ply по plies полуход по уровням: пары (полуход,
+    # {ключ с точностью до отражения: позиция}). В памяти хранится только текущий уровень,
+    # следующий строится, когда предыдущий уже решен
+    row_count, col_count = solver.row_count, solver.col_count
+    level = {0: (0, 0)}
+    for ply in range(plies + 1):
+        if ply >= first_ply:
+            yield ply, level
+        if ply == plies:
+            return
+        next_level = {}
+        for current, mask in level.values():
+            possible = solver.possible(mask)
+            for c in range(col_count):
+                move = possible & solver.column_masks[c]
+                # Позиции, где ход сразу выигрывает, в книгу не попадают
+                if move and not solver.winning_cells(current, mask) & move:
+                    child = current ^ mask, mask | move
+                    key = child[0] + child[1]
+                    next_level.setdefault(min(key, mirror_key(key, row_count, col_count)), child)
+        level = next_level
+
+
+def known_scores(solver):
+    # Известные точные оценки первых позиций: {ключ: оценка}. Их не нужно решать
+    row_count, col_count = solver.row_count, solver.col_count
+    scores = {}
+    for moves, score in KNOWN_SCORES.get((row_count, col_count), {}).items():
+        current = mask = 0
+        for c in moves:
+            current, mask = current ^ mask, mask | (solver.possible(mask) & solver.column_masks[int(c)])
+        key = current + mask
+        scores[min(key, mirror_key(key, row_count, col_count))] = score
+    return scores
+
+
+def load_checkpoint(path, row_count, col_count):
+    # Уже решенные позиции из файла прерванного построения: {ключ: оценка}
+    entries = {}
+    try:
+        with open(path) as fil:
+            if fil.readline().split() != ['C4BK', str(row_count), str(col_count)]:
+                return entries
+            for line in fil:
+                parts = line.split()
+                if len(parts) == 2:
+                    entries[int(parts[0])] = int(parts[1])
+    except (OSError, ValueError):
+        pass
+    return entries
+
+
+def build_book(row_count, col_count, plies, path, first_ply=0, log=print, log_interval=10.0):
+    # Решает все позиции с first_ply по plies полуход и записывает их в книгу.
+    # Точный решатель на Python медленный (на поле 6x7 ранние позиции решаются часами),
+    # поэтому построение можно прервать и продолжить: каждая решенная позиция сразу
+    # дописывается в файл path + '.partial', при следующем запуске решенные позиции пропускаются.
+    # Уровни строятся и решаются по одному от ранних к поздним, в памяти - только текущий.
+    # Позиции с известной оценкой (KNOWN_SCORES) не решаются.
+    if (row_count + 1) * col_count > 56:
+        raise ValueError("ключ позиции {}x{} не помещается в ячейку книги".format(row_count, col_count))
+    if not 0 <= first_ply <= plies:
+        raise ValueError("first_ply должен быть от 0 до plies")
+    solver = Solver(row_count, col_count)
+    known = known_scores(solver)
+
+    checkpoint = path + '.partial'
+    entries = load_checkpoint(checkpoint, row_count, col_count)
+    if entries:
+        log("resuming: {} positions already solved".format(len(entries)))
+    else:
+        with open(checkpoint, 'w') as fil:
+            fil.write("C4BK {} {}\n".format(row_count, col_count))
+
+    start = last_log = time.perf_counter()
+    with open(checkpoint, 'a') as fil:
+        for ply, level in book_levels(solver, plies, first_ply):
+            for key in level.keys() & known.keys():
+                entries[key] = known[key]
+            todo = [(key, pair) for key, pair in sorted(level.items()) if key not in entries]
+            ply_start = time.perf_counter()
+            for done, (key, (current, mask)) in enumerate(todo, 1):
+                entries[key] = solver.solve(current, mask, ply)
+                fil.write("{} {}\n".format(key, entries[key]))
+                fil.flush()
+                now = time.perf_counter()
+                if now - last_log >= log_interval or done == len(todo):
+                    last_log = now
+                    eta = (now - ply_start) / done * (len(todo) - done)
+                    log("ply {}: {}/{} positions, {} nodes, {:.1f} s, ply eta {:.0f} s".format(
+                        ply, done, len(todo), solver.nodes, now - start, eta))
+
+    # Таблица с открытой адресацией, заполненная не больше чем наполовину
+    slot_count = 1
+    while slot_count < 2 * len(entries):
+        slot_count *= 2
+    slots = [0] * slot_count
+    for key, score in entries.items():
+        slot = book_slot(key, slot_count)
+        while slots[slot]:
+            slot = (slot + 1) & (slot_count - 1)
+        slots[slot] = (key << 8) | (score + 128)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as fil:
+        fil.write(HEADER.pack(BOOK_MAGIC, BOOK_VERSION, row_count, col_count, plies, slot_count, first_ply))
+        fil.write(struct.pack('<{}Q'.format(slot_count), *slots))
+    os.replace(tmp_path, path)
+    os.remove(checkpoint)
+    log("written {} positions to {}".format(len(entries), path))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Построение книги дебютов для 4 в ряд")
+    parser.add_argument('--rows', type=int, default=6)
+    parser.add_argument('--cols', type=int, default=7)
+    parser.add_argument('--plies', type=int, default=1, help="последний полуход, позиции которого попадают в книгу")
+    parser.add_argument('--first-ply', type=int, default=0,
+                        help="первый полуход в книге (более ранние позиции не решаются)")
+    parser.add_argument('--out', default=BOOK_PATH)
+    args = parser.parse_args()
+    build_book(args.rows, args.cols, args.plies, args.out, args.first_ply)
@@ -0,0 +1,418 @@
+import math
+import multiprocessing
+import os
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from forinarow_board import Position, PLAYER_PIECE, AI_PIECE
+
+# Типы оценок, хранящихся в таблице
+EXACT = 0  # точное значение
+LOWER = 1  # нижняя граница (было отсечение по beta)
+UPPER = 2  # верхняя граница (ни один ход не поднял alpha)
+
+# Ключ очереди хода: позиции с ходом игрока и компьютера хешируются по-разному
+SIDE_KEY = random.Random(0x5349).getrandbits(64)
+
+
+class TranspositionTable:
+    # Таблица транспозиций фиксированного размера.
+    # Ячейки объединены в корзины по две; при заполнении вытесняется запись
+    # из прошлых поисков, а среди записей текущего поиска - менее глубокая.
+    def __init__(self, size=1 << 18):
+        self.buckets = max(1, size // 2)
+        # Запись: (ключ, глубина, тип оценки, значение, лучший ход, возраст)
+        self.slots = [None] * (self.buckets * 2)
+        self.age = 0
+
+    def new_search(self):
+        # Вызывается перед каждым новым ходом компьютера: старые записи остаются
+        # доступными, но при нехватке места вытесняются первыми
+        self.age += 1
+
+    def clear(self):
+        self.slots = [None] * len(self.slots)
+        self.age = 0
+
+    def probe(self, key):
+        # Возвращает запись для ключа или None
+        index = (key % self.buckets) * 2
+        entry = self.slots[index]
+        if entry is not None and entry[0] == key:
+            return entry
+        entry = self.slots[index + 1]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, flag, value, move):
+        index = (key % self.buckets) * 2
+        first, second = self.slots[index], self.slots[index + 1]
+        entry = (key, depth, flag, value, move, self.age)
+
+        # Та же позиция или свободная ячейка
+        if first is None or first[0] == key:
+            self.slots[index] = entry
+            return
+        if second is None or second[0] == key:
+            self.slots[index + 1] = entry
+            return
+
+        # Обе ячейки заняты: вытесняем запись из старого поиска, иначе менее глубокую
+        first_priority = (first[5] == self.age, first[1])
+        second_priority = (second[5] == self.age, second[1])
+        if first_priority <= second_priority:
+            self.slots[index] = entry
+        else:
+            self.slots[index + 1] = entry
+
+
+# Оценки выигрыша и проигрыша компьютера в конечных позициях
+WIN_SCORE = 100000000000000
+LOSS_SCORE = -10000000000000
+
+
+class SearchTimeout(Exception):
+    # Время на ход истекло (или поиск отменен) посреди итерации поиска
+    pass
+
+
+class SearchStats:
+    # Статистика поиска одного хода
+    def __init__(self, nodes=0, depth=0, elapsed=0.0, move=None, score=None):
+        self.nodes = nodes  # число просмотренных узлов
+        self.depth = depth  # глубина последней завершенной итерации
+        self.elapsed = elapsed  # время на ход в секундах
+        self.move = move
+        self.score = score
+
+    def __str__(self):
+        return "depth {}, {} nodes, {:.2f} s".format(self.depth, self.nodes, self.elapsed)
+
+
+class Searcher:
+    # Минимакс с альфа-бета отсечением на битовой доске с итеративным углублением.
+    # Ходы упорядочиваются так: ход из таблицы транспозиций (главный вариант прошлой
+    # итерации), затем ходы-убийцы этого уровня, затем по истории отсечений и ближе к центру.
+    stop_event = None  # флаг отмены для поиска в дочернем процессе (multiprocessing.Event)
+
+    def __init__(self, tt_size=1 << 18):
+        self.tt = TranspositionTable(tt_size)
+        self.killers = []  # по два хода-убийцы на каждый уровень дерева
+        self.history = {}  # (фишка, столбец) -> вес по числу отсечений
+        self.nodes = 0
+        self.deadline = None
+        self.stop_requested = False  # выставляется из другого потока для отмены поиска
+        self.stats = SearchStats()
+
+    def order_moves(self, moves, tt_move, ply, piece, col_count):
+        # Сортировка ходов для более раннего отсечения
+        center = col_count // 2
+        killers = self.killers[ply] if ply < len(self.killers) else ()
+        history = self.history
+
+        def priority(col):
+            if col == tt_move:
+                return 0, 0
+            if col in killers:
+                return 1, killers.index(col)
+            return 2, -history.get((piece, col), 0), abs(col - center)
+
+        moves.sort(key=priority)
+        return moves
+
+    def remember_cutoff(self, col, piece, depth, ply):
+        # Ход вызвал отсечение: запоминаем его как убийцу и поднимаем его вес в истории
+        while len(self.killers) <= ply:
+            self.killers.append([])
+        killers = self.killers[ply]
+        if col not in killers:
+            killers.insert(0, col)
+            del killers[2:]
+        self.history[piece, col] = self.history.get((piece, col), 0) + depth * depth
+
+    def minimax(self, position, depth, alpha, beta, maximizing_player, ply=0):
+        # Алгоритм Минимакс для выбора оптимального хода
+        self.nodes += 1
+        if not self.nodes & 1023 and (self.stop_requested or
+                                      self.deadline is not None and time.perf_counter() > self.deadline or
+                                      self.stop_event is not None and self.stop_event.is_set()):
+            raise SearchTimeout
+
+        # Выиграть мог только тот, кто ходил последним, поэтому проверяется одна маска
+        if position.last_move_won():
+            return None, WIN_SCORE if position.history[-1][1] == AI_PIECE else LOSS_SCORE
+        if position.is_full():
+            return None, 0
+        if depth == 0:
+            return None, position.score(AI_PIECE)
+
+        # Проверяем таблицу транспозиций перед раскрытием узла
+        key = position.hash if maximizing_player else position.hash ^ SIDE_KEY
+        entry = self.tt.probe(key)
+        tt_move = None
+        if entry is not None:
+            _, entry_depth, flag, entry_value, tt_move, _ = entry
+            if entry_depth >= depth:
+                if flag == EXACT or \
+                        (flag == LOWER and entry_value >= beta) or \
+                        (flag == UPPER and entry_value <= alpha):
+                    return tt_move, entry_value
+        alpha_orig, beta_orig = alpha, beta
+
+        valid_locations = position.valid_moves()
+        piece = AI_PIECE if maximizing_player else PLAYER_PIECE
+        self.order_moves(valid_locations, tt_move, ply, piece, position.col_count)
+        # Случайный ход - только запасной вариант, если все ходы одинаково плохи
+        column = random.choice(valid_locations)
+        if maximizing_player:
+            value = -math.inf
+            for col in valid_locations:
+                position.play(col, AI_PIECE)
+                new_score = self.minimax(position, depth - 1, alpha, beta, False, ply + 1)[1]
+                position.undo()
+                if new_score > value:
+                    value = new_score
+                    column = col
+                alpha = max(alpha, value)
+                if alpha >= beta:
+                    self.remember_cutoff(col, piece, depth, ply)
+                    break
+        else:
+            value = math.inf
+            for col in valid_locations:
+                position.play(col, PLAYER_PIECE)
+                new_score = self.minimax(position, depth - 1, alpha, beta, True, ply + 1)[1]
+                position.undo()
+                if new_score < value:
+                    value = new_score
+                    column = col
+                beta = min(beta, value)
+                if alpha >= beta:
+                    self.remember_cutoff(col, piece, depth, ply)
+                    break
+
+        # Сохраняем результат вместе с типом оценки
+        if value <= alpha_orig:
+            flag = UPPER
+        elif value >= beta_orig:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt.store(key, depth, flag, value, column)
+        return column, value
+
+    def search_depth(self, position, depth):
+        # Одна итерация углубления: поиск из корня на фиксированную глубину
+        return self.minimax(position, depth, -math.inf, math.inf, True)
+
+    def close(self):
+        # Освобождение ресурсов поиска (для совместимости с ParallelSearcher)
+        pass
+
+    def search(self, position, time_budget=1.0, max_depth=None):
+        # Итеративное углубление: ищем на глубину 1, 2, 3... пока не кончится время
+        # и возвращаем ход последней полностью завершенной итерации
+        start = time.perf_counter()
+        empty_cells = position.row_count * position.col_count - len(position.history)
+        if max_depth is None or max_depth > empty_cells:
+            max_depth = empty_cells
+
+        self.tt.new_search()
+        self.killers = []
+        # Старая история отсечений постепенно забывается
+        self.history = {move: weight // 2 for move, weight in self.history.items() if weight > 1}
+        self.nodes = 0
+        self.deadline = None
+
+        # Поиск идет по копии, чтобы прерванная итерация не испортила позицию
+        work = position.copy()
+        column, value, depth_done = None, None, 0
+        for depth in range(1, max_depth + 1):
+            try:
+                column, value = self.search_depth(work, depth)
+            except SearchTimeout:
+                break
+            depth_done = depth
+            elapsed = time.perf_counter() - start
+            # Исход игры уже известен, или следующая итерация заведомо не успеет
+            if value >= WIN_SCORE or value <= LOSS_SCORE or \
+                    (time_budget is not None and elapsed * 2 > time_budget):
+                break
+            if self.stop_requested:
+                break
+            # Первая итерация всегда доводится до конца, дальше следим за временем
+            if time_budget is not None:
+                self.deadline = start + time_budget
+
+        self.deadline = None
+        self.stats = SearchStats(self.nodes, depth_done, time.perf_counter() - start, column, value)
+        return column, value
+
+
+class SearchWorker:
+    # Поиск хода в фоновом потоке, чтобы игровой цикл продолжал обрабатывать события
+    # и перерисовывать окно. Поиск проверяет флаг отмены каждые 1024 узла.
+    def __init__(self, searcher):
+        self.searcher = searcher
+        self.thread = None
+        self.result = None
+
+    def start(self, position, time_budget=1.0, max_depth=None):
+        # Запуск поиска по копии позиции
+        self.result = None
+        self.searcher.stop_requested = False
+        self.thread = threading.Thread(target=self._run, args=(position.copy(), time_budget, max_depth),
+                                       daemon=True)
+        self.thread.start()
+
+    def _run(self, position, time_budget, max_depth):
+        self.result = self.searcher.search(position, time_budget, max_depth)
+
+    def busy(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def take_result(self):
+        # Результат завершенного поиска (столбец, оценка) или None, если поиск еще идет
+        if self.thread is None or self.thread.is_alive():
+            return None
+        self.thread = None
+        return self.result
+
+    def cancel(self):
+        # Немедленная остановка поиска, результат отбрасывается
+        if self.thread is not None:
+            self.searcher.stop_requested = True
+            self.thread.join()
+            self.thread = None
+            self.result = None
+
+
+# Поиск в дочернем процессе пула: у каждого процесса свой Searcher со своей
+# таблицей транспозиций, которая сохраняется между ходами одной партии
+_worker_searcher = None
+_worker_search_id = None
+
+
+def _init_worker(tt_size, stop_event):
+    global _worker_searcher
+    _worker_searcher = Searcher(tt_size)
+    _worker_searcher.stop_event = stop_event
+
+
+def _search_child(row_count, col_count, history, col, depth, search_id, wall_deadline):
+    # Оценка хода компьютера col из корня: поиск в позиции после этого хода на глубину depth - 1.
+    # Возвращает (col, оценка, число узлов); оценка None, если время вышло.
+    global _worker_search_id
+    searcher = _worker_searcher
+    if search_id != _worker_search_id:
+        # Новый ход партии
+        _worker_search_id = search_id
+        searcher.tt.new_search()
+        searcher.killers = []
+    position = Position(row_count, col_count)
+    for c, piece in history:
+        position.play(c, piece)
+    position.play(col, AI_PIECE)
+
+    searcher.nodes = 0
+    if wall_deadline is None:
+        searcher.deadline = None
+    else:
+        # Часы perf_counter у процессов разные, поэтому срок передается по time.time()
+        searcher.deadline = time.perf_counter() + (wall_deadline - time.time())
+    try:
+        value = searcher.minimax(position, depth - 1, -math.inf, math.inf, False, 1)[1]
+    except SearchTimeout:
+        value = None
+    return col, value, searcher.nodes
+
+
+class ParallelSearcher(Searcher):
+    # Параллельный поиск с разделением корня: каждый ход из корня оценивается
+    # в отдельном процессе пула с полным окном, лучший выбирается так же, как
+    # в последовательном поиске (первый с максимальной оценкой при обходе от центра).
+    # На фиксированной глубине результат совпадает с Searcher.minimax.
+    # Параллельно ищется только корень за компьютера (search, search_depth и minimax из корня);
+    # остальные вызовы minimax идут в главном процессе со своей таблицей транспозиций.
+    def __init__(self, workers=None, tt_size=1 << 18):
+        self.workers = workers or os.cpu_count() or 1
+        self.tt_size = tt_size
+        self.pool = None
+        self.search_id = 0
+        # Флаг отмены общий с процессами пула. Он создается сразу, а не вместе с пулом,
+        # чтобы отмена, пришедшая до первого поиска, не терялась. Сбрасывает его SearchWorker.start
+        self.stop_event = multiprocessing.Event()
+        super().__init__(tt_size)
+
+    @property
+    def stop_requested(self):
+        return self.stop_event.is_set()
+
+    @stop_requested.setter
+    def stop_requested(self, value):
+        if value:
+            self.stop_event.set()
+        else:
+            self.stop_event.clear()
+
+    def start_pool(self):
+        # Пул создается при первом поиске и живет до конца партии
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                            initargs=(self.tt_size, self.stop_event))
+
+    def close(self):
+        if self.pool is not None:
+            self.stop_requested = True
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+
+    def search(self, position, time_budget=1.0, max_depth=None):
+        self.start_pool()
+        self.search_id += 1
+        return super().search(position, time_budget, max_depth)
+
+    def minimax(self, position, depth, alpha, beta, maximizing_player, ply=0):
+        # Корень за компьютера делится между процессами (всегда с полным окном),
+        # законченная партия и узлы ниже корня считаются обычным минимаксом
+        if ply or not maximizing_player or depth <= 0 or position.last_move_won() or position.is_full():
+            return super().minimax(position, depth, alpha, beta, maximizing_player, ply)
+        return self.search_depth(position, depth)
+
+    def search_depth(self, position, depth):
+        self.start_pool()
+        moves = position.valid_moves()
+        center = position.col_count // 2
+        moves.sort(key=lambda col: abs(col - center))
+        wall_deadline = None
+        if self.deadline is not None:
+            wall_deadline = time.time() + (self.deadline - time.perf_counter())
+
+        futures = [self.pool.submit(_search_child, position.row_count, position.col_count,
+                                    position.history, col, depth, self.search_id, wall_deadline)
+                   for col in moves]
+        # Ждем короткими интервалами, чтобы отмена срабатывала сразу
+        pending = futures
+        while pending:
+            _, pending = wait(pending, timeout=0.05)
+            if self.stop_requested:
+                for future in pending:
+                    future.cancel()
+                raise SearchTimeout
+
+        values = {}
+        for future in futures:
+            col, value, nodes = future.result()
+            self.nodes += nodes
+            if value is None:
+                raise SearchTimeout
+            values[col] = value
+
+        column, best = moves[0], -math.inf
+        for col in moves:
+            if values[col] > best:
+                column, best = col, values[col]
+        return column, best
@@ -0,0 +1,77 @@
+import os
+import time
+
+
+class HighScores:
+    """
+    Таблица лучших результатов игры. Файл читается один раз при создании,
+    дальше таблица живет в памяти и записывается на диск только после изменения.
+    Формат файла: по строке на результат, "очки дата время", от лучшего к худшему.
+    Старый формат (одно число без даты) тоже читается.
+    """
+
+    def __init__(self, path, size=10):
+        self.path = path
+        self.size = size
+        self.entries = []  # пары (очки, время записи)
+        self.changed = False
+        self.load()
+
+    def load(self):
+        """
+        Чтение таблицы из файла; нечитаемые строки пропускаются, отсутствующий файл - пустая таблица.
+        """
+        try:
+            with open(self.path) as fil:
+                lines = fil.read().splitlines()
+        except OSError:
+            lines = []
+        entries = []
+        for line in lines:
+            parts = line.split(maxsplit=1)
+            if not parts:
+                continue
+            try:
+                score = int(parts[0])
+            except ValueError:
+                continue
+            entries.append((score, parts[1] if len(parts) > 1 else ''))
+        entries.sort(key=lambda entry: -entry[0])
+        self.entries = entries[:self.size]
+
+    def best(self):
+        """
+        Рекорд: лучший результат в таблице или 0.
+        """
+        return self.entries[0][0] if self.entries else 0
+
+    def add(self, score):
+        """
+        Добавление результата, если он попадает в таблицу.
+        Возвращает место в таблице (начиная с 1) или None.
+        """
+        if score <= 0:
+            return None
+        place = 0
+        while place < len(self.entries) and self.entries[place][0] >= score:
+            place += 1
+        if place >= self.size:
+            return None
+        self.entries.insert(place, (score, time.strftime('%Y-%m-%d %H:%M:%S')))
+        del self.entries[self.size:]
+        self.changed = True
+        return place + 1
+
+    def save(self):
+        """
+        Запись таблицы, если она изменилась: во временный файл, который затем
+        заменяет старый, поэтому файл не окажется записанным наполовину.
+        """
+        if not self.changed:
+            return
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as fil:
+            for score, stamp in self.entries:
+                fil.write("{} {}".format(score, stamp).rstrip() + "\n")
+        os.replace(tmp_path, self.path)
+        self.changed = False
@@ -1,17 +1,99 @@
+import os
+import threading
+
 import pygame
 
-STOPPED_PLAYING = pygame.USEREVENT + 1
-pygame.mixer.music.set_endevent(STOPPED_PLAYING)
+# Папка с музыкой и поддерживаемые форматы
+MUSIC_DIR = 'data'
+EXTENSIONS = ('.mp3', '.ogg', '.wav')
+VOLUME = 0.15
+# Как часто фоновый поток проверяет, пора ли ставить в очередь следующий трек, с
+POLL_INTERVAL = 0.5
+
+
+class Playlist:
+    # Фоновое проигрывание музыки по кругу. Список треков составляется один раз,
+    # следующий трек ставится в очередь pygame.mixer.music фоновым потоком заранее,
+    # поэтому смена трека не требует работы от игровых циклов. Треки не загружаются
+    # в память целиком, а читаются с диска по мере проигрывания.
+    def __init__(self, folder=MUSIC_DIR, volume=VOLUME):
+        try:
+            names = sorted(os.listdir(folder))
+        except OSError:
+            names = []
+        self.tracks = [os.path.join(folder, name) for name in names if name.lower().endswith(EXTENSIONS)]
+        self.volume = volume
+        self.current = 0  # номер следующего трека
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is not None or not self.tracks or not pygame.mixer.get_init():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        # Остановка потока; вызывается до pygame.quit, пока микшер еще работает
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
 
+    def next_track(self, load):
+        # Загрузка (load) или постановка в очередь следующего трека; нечитаемые файлы пропускаются.
+        # False - ни один трек не читается
+        for _ in range(len(self.tracks)):
+            path = self.tracks[self.current]
+            self.current = (self.current + 1) % len(self.tracks)
+            try:
+                load(path)
+                return True
+            except pygame.error:
+                continue
+        return False
 
-numbers_of_sounds = list(range(0, 7))
-curr_number = 0
+    def run(self):
+        pygame.mixer.music.set_volume(self.volume)
+        if not self.next_track(pygame.mixer.music.load):
+            return
+        pygame.mixer.music.play()
+        queued = self.next_track(pygame.mixer.music.queue)
+        position = 0
+        while not self.stop_event.wait(POLL_INTERVAL):
+            if not pygame.mixer.get_init():
+                return
+            if not pygame.mixer.music.get_busy():
+                # Очередь кончилась (или трек не удалось поставить) - запускаем следующий сами
+                if not self.next_track(pygame.mixer.music.load):
+                    return
+                pygame.mixer.music.play()
+                queued = self.next_track(pygame.mixer.music.queue)
+                position = 0
+                continue
+            # Когда начинает играть трек из очереди, время проигрывания отсчитывается заново:
+            # значит, очередь освободилась и в нее можно поставить следующий
+            previous, position = position, pygame.mixer.music.get_pos()
+            if queued and position < previous:
+                queued = self.next_track(pygame.mixer.music.queue)
+        if pygame.mixer.get_init():
+            pygame.mixer.music.stop()
+
+
+playlist = None
 
 
 def play_music():
-    global curr_number
-    pygame.mixer.music.load(r'data\sound_{}.mp3'.format(curr_number))
-    pygame.mixer.music.play()
-    pygame.mixer.music.set_volume(0.15)
-    curr_number += 1
-    curr_number = curr_number % len(numbers_of_sounds)
+    # Запуск фоновой музыки (повторный вызов ничего не делает)
+    global playlist
+    if playlist is None:
+        playlist = Playlist()
+        # Поток музыки останавливается при pygame.quit раньше микшера, в том числе при выходе через sys.exit
+        pygame.register_quit(stop_music)
+    playlist.start()
+
+
+def stop_music():
+    if playlist is not None:
+        playlist.stop()
@@ -0,0 +1,182 @@
+import json
+import os
+import time
+
+import numpy as np
+import pygame
+
+# Клавиши: F3 - включить/выключить запись и панель с замерами, F4 - сохранить trace
+TOGGLE_KEY = pygame.K_F3
+EXPORT_KEY = pygame.K_F4
+# Сколько последних кадров хранится
+CAPACITY = 600
+# Фазы, в которых цикл ждет (событий или следующего кадра), во время работы кадра они не входят
+IDLE_PHASES = ('wait',)
+# Как часто пересчитываются числа на панели, с
+HUD_INTERVAL = 0.25
+# Папка для файлов trace (открываются в chrome://tracing или ui.perfetto.dev)
+TRACE_DIR = 'profiles'
+
+
+class Profiler:
+    """
+    Замеры игровых циклов по фазам. Цикл отмечает начало кадра (frame) и конец каждой
+    фазы (lap): время фазы - от предыдущей отметки. Кадры хранятся в кольцевом буфере
+    на CAPACITY кадров, старые перезаписываются.
+    Выключенный профайлер ничего не замеряет: каждая отметка - только проверка флага.
+    Включается клавишей F3 или переменной окружения PROFILE=1.
+    """
+
+    def __init__(self, capacity=CAPACITY):
+        self.enabled = bool(os.environ.get('PROFILE'))
+        self.capacity = capacity
+        self.name = 'game'  # какой цикл сейчас замеряется
+        self.frames = [None] * capacity  # (начало кадра, конец кадра, фазы (имя, начало, конец))
+        self.index = 0  # куда запишется следующий кадр
+        self.count = 0
+        self.spans = []  # фазы текущего кадра
+        self.frame_start = self.mark = 0.0
+        self.font = None
+        self.hud = None  # готовая панель и время, когда она нарисована
+        self.hud_time = 0.0
+        self.hud_size = (0, 0)  # панель не уменьшается, иначе на экране остались бы ее края
+
+    def section(self, name):
+        """
+        Начало замеров нового цикла (меню или игры): буфер очищается, открытый кадр отбрасывается.
+        """
+        self.name = name
+        self.hud_size = (0, 0)
+        self.reset()
+
+    def reset(self):
+        self.frames = [None] * self.capacity
+        self.index = self.count = 0
+        self.spans = []
+        self.frame_start = self.mark = time.perf_counter()
+        self.hud = None
+
+    def frame(self):
+        """
+        Конец предыдущего кадра и начало следующего.
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.spans:
+            self.frames[self.index] = (self.frame_start, now, tuple(self.spans))
+            self.index = (self.index + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+            self.spans = []
+        self.frame_start = self.mark = now
+
+    def lap(self, name):
+        """
+        Конец фазы name: она длилась от предыдущей отметки до этого вызова.
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.spans.append((name, self.mark, now))
+        self.mark = now
+
+    def recorded(self):
+        """
+        Записанные кадры от старых к новым.
+        """
+        if self.count < self.capacity:
+            return self.frames[:self.count]
+        return self.frames[self.index:] + self.frames[:self.index]
+
+    def stats(self):
+        """
+        Перцентили времени работы кадра (без фаз ожидания) и 95-й перцентиль каждой фазы, мс.
+        """
+        frames = self.recorded()
+        if not frames:
+            return None, {}
+        busy = []
+        phases = {}
+        for i, (_, _, spans) in enumerate(frames):
+            total = 0.0
+            for name, start, end in spans:
+                durations = phases.setdefault(name, [0.0] * len(frames))
+                durations[i] += end - start
+                if name not in IDLE_PHASES:
+                    total += end - start
+            busy.append(total)
+        busy = 1000 * np.array(busy)
+        frame = dict(zip(('p50', 'p95', 'p99'), np.percentile(busy, (50, 95, 99))), max=busy.max())
+        return frame, {name: 1000 * np.percentile(durations, 95) for name, durations in phases.items()}
+
+    def draw_hud(self, surface):
+        """
+        Панель с замерами в левом верхнем углу surface. Возвращает ее область для обновления экрана
+        или None, если профайлер выключен.
+        """
+        if not self.enabled:
+            return None
+        now = time.perf_counter()
+        if self.hud is None or now - self.hud_time > HUD_INTERVAL:
+            self.hud = self.render_hud()
+            self.hud_time = now
+        return surface.blit(self.hud, (0, 0))
+
+    def render_hud(self):
+        if self.font is None:
+            self.font = pygame.font.SysFont('monospace', 14)
+        frame, phases = self.stats()
+        lines = ["{} {} frames".format(self.name, self.count)]
+        if frame is not None:
+            lines.append("frame p50 {p50:.1f} p95 {p95:.1f} p99 {p99:.1f} max {max:.1f} ms".format(**frame))
+            lines += ["  {:8} p95 {:6.2f} ms".format(name, value) for name, value in phases.items()]
+        labels = [self.font.render(line, True, (255, 255, 0)) for line in lines]
+        self.hud_size = (max(self.hud_size[0], max(label.get_width() for label in labels) + 8),
+                         max(self.hud_size[1], sum(label.get_height() for label in labels) + 8))
+        hud = pygame.Surface(self.hud_size)
+        y = 4
+        for label in labels:
+            hud.blit(label, (4, y))
+            y += label.get_height()
+        return hud
+
+    def handle_event(self, event):
+        """
+        Клавиши профайлера. Возвращает True, если панель спрятана и окно нужно перерисовать целиком.
+        """
+        if event.type != pygame.KEYDOWN:
+            return False
+        if event.key == TOGGLE_KEY:
+            self.enabled = not self.enabled
+            self.reset()
+            return not self.enabled
+        if event.key == EXPORT_KEY and self.count:
+            print("trace saved to " + self.export())
+        return False
+
+    def export(self, path=None):
+        """
+        Запись кадров в формате Chrome trace (JSON): кадры и их фазы - вложенные события.
+        Возвращает путь к файлу.
+        """
+        frames = self.recorded()
+        if path is None:
+            os.makedirs(TRACE_DIR, exist_ok=True)
+            path = os.path.join(TRACE_DIR, "{}_{}.json".format(self.name, time.strftime('%Y%m%d_%H%M%S')))
+        origin = frames[0][0] if frames else 0.0
+
+        def event(name, start, end):
+            return {'name': name, 'ph': 'X', 'pid': 1, 'tid': 1,
+                    'ts': round(1e6 * (start - origin), 1), 'dur': round(1e6 * (end - start), 1)}
+
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': 1, 'args': {'name': self.name}}]
+        for start, end, spans in frames:
+            events.append(event('frame', start, end))
+            events += [event(name, span_start, span_end) for name, span_start, span_end in spans]
+        with open(path, 'w') as fil:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, fil)
+        return path
+
+
+# Общий профайлер меню и игр: включенный в меню остается включенным и в игре
+profiler = Profiler()
@@ -2,6 +2,12 @@ import numpy as np
 import random
 import pygame
 from pygame.locals import *
+import py2048_engine
+import py2048_ai
+from profiler import profiler
+
+# Событие "компьютер нашел ход" (приходит из фонового потока поиска)
+AI_MOVE = pygame.event.custom_type()
 
 # Определение цветовой палитры для каждой плитки, соответствующей числу на плитке
 ColorPalette = {
@@ -36,6 +42,16 @@ class DveTysyachiSorokVosyem:
             self.num = 2
         # Создание игрового поля (матрицы) с нулями
         self.grid = np.zeros((self.num, self.num), dtype=int)
+        # Для поля 4x4 ходы считаются по таблицам на упакованном 64-битном поле,
+        # а self.grid остается распакованным видом для отрисовки
+        self.packed = self.num == 4
+        self.board = 0
+        self.score = 0
+
+        # Компьютерный игрок для поля 4x4: подсказка (клавиша H) и автоигра (клавиша A)
+        self.ai = py2048_ai.AIWorker(self.post_ai_move) if self.packed else None
+        self.hint = None  # направление, предложенное подсказкой
+        self.auto = False
 
         # Определение размеров экрана и отступов
         self.sz = self.num * 100
@@ -43,14 +59,20 @@ class DveTysyachiSorokVosyem:
         self.running = True
         self.fl = True  # Флаг для состояния игры
 
-        pygame.init()
+        # pygame уже инициализирован меню
         pygame.display.set_caption("2048")
         programicon = pygame.image.load('icons/2048.png')  # Иконка окна
         pygame.display.set_icon(programicon)
 
-        pygame.font.init()
-        # Настройка шрифта для чисел
+        # Настройка шрифта для чисел и для надписи об окончании игры
         self.myfont = pygame.font.SysFont('Comic Sans MS', 30)
+        self.game_over_font = pygame.font.SysFont('Comic Sans MS', 50)
+
+        # Готовые изображения плиток: (число, размер плитки) -> поверхность, создаются при первом появлении
+        self.tile_sprites = {}
+        # Что сейчас нарисовано на экране (None - окно нужно нарисовать целиком)
+        self.drawn = None
+        self.drawn_hint = None
 
         # Создание экрана с заданными размерами
         self.screen = pygame.display.set_mode((self.sz, self.sz))
@@ -88,9 +110,24 @@ class DveTysyachiSorokVosyem:
         for pos in random.sample(free_poss, k):
             # Генерируем число 2 или 4 на случайной пустой клетке
             self.grid[pos] = 4 if random.random() < 0.1 else 2
+            if self.packed:
+                # Индексы из np.where - числа NumPy, а поле должно остаться обычным int
+                shift = 4 * (self.num * int(pos[0]) + int(pos[1]))
+                self.board |= (2 if self.grid[pos] == 4 else 1) << shift
 
     def make_move(self, move):
-        # Выполнение хода (сдвига плиток) в заданном направлении
+        # Выполнение хода (сдвига плиток) в заданном направлении.
+        # Возвращает True, если ход изменил поле.
+        if self.packed:
+            board, score = py2048_engine.move(self.board, move)
+            if board == self.board:
+                return False
+            self.board = board
+            self.score += score
+            self.grid = py2048_engine.decode(board)
+            return True
+
+        old_grid = self.grid.copy()
         for i in range(self.num):
             if move in 'lr':
                 # Обрабатываем строки для левого и правого сдвига
@@ -119,100 +156,168 @@ class DveTysyachiSorokVosyem:
                 self.grid[i, :] = new_this
             else:
                 self.grid[:, i] = new_this
+        return not all((self.grid == old_grid).flatten())
+
+    def tile_sprite(self, n, size):
+        # Изображение плитки с числом n (вместе с фоном поля вокруг скругленных углов)
+        key = (n, size)
+        sprite = self.tile_sprites.get(key)
+        if sprite is None:
+            sprite = pygame.Surface((size, size)).convert()
+            sprite.fill((189, 172, 161))
+            pygame.draw.rect(sprite, ColorPalette[n], pygame.Rect(0, 0, size, size), border_radius=5)
+            if n:
+                text_surface = self.myfont.render(str(n), True, (0, 0, 0))
+                sprite.blit(text_surface, text_surface.get_rect(center=(size / 2, size / 2)))
+            self.tile_sprites[key] = sprite
+        return sprite
 
     def draw(self):
-        # Прорисовка игрового поля
-        self.screen.fill((189, 172, 161))  # Цвет фона игрового поля
+        # Прорисовка игрового поля: перерисовываются только изменившиеся плитки.
+        # Возвращает список областей экрана, которые нужно обновить.
+        full = self.drawn is None or self.hint != self.drawn_hint
+        if full:
+            self.screen.fill((189, 172, 161))  # Цвет фона игрового поля
+        dirty = [self.screen.get_rect()] if full else []
 
+        size = self.sz // self.num - 2 * self.SPACING  # Размер плитки
         for i in range(self.num):
             for j in range(self.num):
-                n = self.grid[i][j]  # Получаем значение плитки
-                # Координаты и размер плитки
+                n = int(self.grid[i][j])  # Получаем значение плитки
+                if not full and self.drawn[i][j] == n:
+                    continue
+                # Координаты плитки
                 rect_x = j * self.sz // self.num + self.SPACING
                 rect_y = i * self.sz // self.num + self.SPACING
-                rect_w = self.sz // self.num - 2 * self.SPACING
-                rect_h = self.sz // self.num - 2 * self.SPACING
-
-                # Прорисовка плитки с нужным цветом
-                pygame.draw.rect(self.screen,
-                                 ColorPalette[n],
-                                 pygame.Rect(rect_x, rect_y, rect_w, rect_h),
-                                 border_radius=5)
-                if n:
-                    # Прорисовка числа на плитке
-                    text_surface = self.myfont.render(str(n), True, (0, 0, 0))
-                    text_rect = text_surface.get_rect(center=(rect_x + rect_w / 2,
-                                                              rect_y + rect_h / 2))
-                    self.screen.blit(text_surface, text_rect)
+                rect = self.screen.blit(self.tile_sprite(n, size), (rect_x, rect_y))
+                if not full:
+                    dirty.append(rect)
+
+        if self.hint:
+            self.draw_hint()
+        self.drawn = self.grid.copy()
+        self.drawn_hint = self.hint
+        return dirty
+
+    def draw_hint(self):
+        # Стрелка у края поля в сторону хода, предложенного компьютером
+        c, a = self.sz // 2, 20
+        points = {'u': [(c, 0), (c - a, a), (c + a, a)],
+                  'd': [(c, self.sz), (c - a, self.sz - a), (c + a, self.sz - a)],
+                  'l': [(0, c), (a, c - a), (a, c + a)],
+                  'r': [(self.sz, c), (self.sz - a, c - a), (self.sz - a, c + a)]}
+        pygame.draw.polygon(self.screen, (119, 110, 101), points[self.hint])
+
+    @staticmethod
+    def post_ai_move(direction, board):
+        # Вызывается из фонового потока: передаем ход в игровой цикл через очередь событий
+        pygame.event.post(pygame.event.Event(AI_MOVE, direction=direction, board=board))
 
     def is_game_over(self):
-        # Проверка на окончание игры (нет возможных ходов)
-        grid_bu = self.grid.copy()
-        for move in 'lrud':
-            self.make_move(move)
-            if not all((self.grid == grid_bu).flatten()):
-                # Если возможен ход, восстанавливаем исходное состояние и возвращаем False
-                self.grid = grid_bu
-                return False
-        return True
+        # Проверка на окончание игры: нет пустых клеток и равных соседних плиток.
+        # Поле при проверке не изменяется.
+        if self.packed:
+            return not py2048_engine.can_move(self.board)
+        grid = self.grid
+        return grid.all() and not (grid[:, 1:] == grid[:, :-1]).any() and not (grid[1:] == grid[:-1]).any()
 
     def display_game_over(self):
         # Метод для вывода надписи "GAME OVER" на экран
         self.screen.fill((189, 172, 161))  # Цвет фона экрана при завершении игры
-        game_over_font = pygame.font.SysFont('Comic Sans MS', 50)  # Шрифт для надписи
-        game_over_text = game_over_font.render("GAME OVER", True, (255, 0, 0))  # Создание текста
+        self.drawn = None
+        game_over_text = self.game_over_font.render("GAME OVER", True, (255, 0, 0))  # Создание текста
         text_rect = game_over_text.get_rect(center=(self.sz // 2, self.sz // 2))  # Центрирование текста
         self.screen.blit(game_over_text, text_rect)  # Отображение текста на экране
         pygame.display.flip()  # Обновление экрана
         pygame.time.delay(2000)  # Пауза для показа надписи
 
     def wait_for_key(self):
-        # Ожидание ввода пользователя с клавиатуры
+        # Ожидание ввода пользователя с клавиатуры: поток спит до следующего события
         while True:
-            if self.is_game_over():
-                # Если игра окончена, выставляем флаг и завершаем
-                self.fl = False
-                print('GAME OVER!')
-                self.display_game_over()
-                break
-            for event in pygame.event.get():
-                if event.type == QUIT:
+            event = pygame.event.wait()
+            if event.type == QUIT:
+                return 'q'
+            if event.type in (VIDEOEXPOSE, WINDOWEXPOSED) or profiler.handle_event(event):
+                # Окно было перекрыто (или спрятана панель профайлера) - рисуем его целиком
+                self.drawn = None
+                return ''
+            if event.type == AI_MOVE:
+                # Ход для устаревшего поля не нужен
+                if event.board != self.board or event.direction is None:
+                    continue
+                if self.auto:
+                    return event.direction
+                # Режим подсказки: поле нужно только перерисовать со стрелкой
+                self.hint = event.direction
+                return ''
+            if event.type == KEYDOWN:
+                # Определяем направление хода по клавише
+                if event.key == K_UP:
+                    return 'u'
+                elif event.key == K_RIGHT:
+                    return 'r'
+                elif event.key == K_LEFT:
+                    return 'l'
+                elif event.key == K_DOWN:
+                    return 'd'
+                elif event.key == K_q or event.key == K_ESCAPE:
                     return 'q'
-                if event.type == KEYDOWN:
-                    # Определяем направление хода по клавише
-                    if event.key == K_UP:
-                        return 'u'
-                    elif event.key == K_RIGHT:
-                        return 'r'
-                    elif event.key == K_LEFT:
-                        return 'l'
-                    elif event.key == K_DOWN:
-                        return 'd'
-                    elif event.key == K_q or event.key == K_ESCAPE:
-                        return 'q'
+                elif event.key == K_h:
+                    return 'h'
+                elif event.key == K_a:
+                    return 'a'
 
     def play(self):
-        # Основной игровой цикл
+        # Основной игровой цикл, возвращает набранные очки
         self.gen_num(2)  # Генерируем две стартовые плитки
 
+        # Кадр здесь - обработка одного события: отрисовка, ожидание команды, ход
+        profiler.section('2048')
         while True:
-            self.draw()  # Прорисовка текущего состояния поля
-            pygame.display.flip()  # Обновление экрана
+            profiler.frame()
+            # Прорисовка текущего состояния поля (и панели профайлера) и обновление изменившихся областей экрана
+            dirty = self.draw()
+            hud = profiler.draw_hud(self.screen)
+            if hud:
+                dirty.append(hud)
+            profiler.lap('draw')
+            pygame.display.update(dirty)
+            profiler.lap('display')
+            if self.auto:
+                # В режиме автоигры следующий ход считается в фоне, окно продолжает отвечать
+                self.ai.start(self.board)
+                profiler.lap('ai')
             cmd = self.wait_for_key()  # Ожидание команды игрока
-            if not self.fl:
-                break  # Если игра окончена, выходим из цикла
+            profiler.lap('wait')
             if cmd == 'q':
                 self.screen = self.menu_sc  # Возвращение к экрану меню
                 break
+            if cmd in ('h', 'a'):
+                if self.ai is not None:
+                    if cmd == 'a':
+                        self.auto = not self.auto
+                    else:
+                        self.ai.start(self.board)
+                continue
+            if not cmd:
+                continue
+            self.hint = None
 
-            # Сохраняем текущее состояние поля и выполняем ход
-            old_grid = self.grid.copy()
-            self.make_move(cmd)
-
-            # Если ход изменил поле, генерируем новую плитку
-            if not all((self.grid == old_grid).flatten()):
+            # Выполняем ход; если он изменил поле, генерируем новую плитку.
+            # Конец игры может наступить только после такого хода.
+            if self.make_move(cmd):
                 self.gen_num()
+                if self.is_game_over():
+                    # Если игра окончена, выставляем флаг и завершаем
+                    self.fl = False
+                    pygame.display.update(self.draw())
+                    print('GAME OVER!')
+                    self.display_game_over()
+                    break
+            profiler.lap('logic')
+
+        # Останавливаем поиск компьютера, если он еще идет
+        if self.ai is not None:
+            self.ai.cancel()
 
-        # Запись информации об окончании игры
-        with open("game_end.txt", "w") as fil:
-            fil.write("1")
+        return self.score
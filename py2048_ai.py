@@ -0,0 +1,228 @@
+import threading
+import time
+
+import py2048_engine
+from py2048_engine import move, transpose, zero_cells, ROW_MASK
+
+# Веса эвристики строки (подобраны для 2048 в открытых решателях на expectimax)
+LOST_PENALTY = 200000.0
+MONOTONICITY_POWER = 4.0
+MONOTONICITY_WEIGHT = 47.0
+SUM_POWER = 3.5
+SUM_WEIGHT = 11.0
+MERGES_WEIGHT = 700.0
+EMPTY_WEIGHT = 270.0
+
+# Вероятности новых плиток, как в gen_num: 2 - в 90% случаев, 4 - в 10%
+SPAWN_TWO = 0.9
+SPAWN_FOUR = 0.1
+# Ветки с вероятностью меньше этой не раскрываются
+MIN_PROBABILITY = 0.0001
+
+ROW_HEURISTIC = None
+
+
+def build_heuristic():
+    # Таблица эвристики для всех 65536 строк
+    global ROW_HEURISTIC
+    table = [0.0] * 65536
+    for row in range(65536):
+        line = [(row >> (4 * j)) & 0xF for j in range(4)]
+        total = sum(e ** SUM_POWER for e in line)
+        empty = line.count(0)
+
+        # Соседние одинаковые плитки (в том числе через пустые клетки)
+        merges = 0
+        prev = 0
+        counter = 0
+        for e in line:
+            if not e:
+                continue
+            if prev == e:
+                counter += 1
+            elif counter > 0:
+                merges += 1 + counter
+                counter = 0
+            prev = e
+        if counter > 0:
+            merges += 1 + counter
+
+        # Штраф за немонотонность строки в обе стороны
+        left = right = 0.0
+        for j in range(3):
+            a = line[j] ** MONOTONICITY_POWER
+            b = line[j + 1] ** MONOTONICITY_POWER
+            if line[j] > line[j + 1]:
+                left += a - b
+            else:
+                right += b - a
+
+        table[row] = LOST_PENALTY + EMPTY_WEIGHT * empty + MERGES_WEIGHT * merges - \
+            MONOTONICITY_WEIGHT * min(left, right) - SUM_WEIGHT * total
+    ROW_HEURISTIC = table
+
+
+def heuristic(board):
+    # Сумма эвристик всех строк и всех столбцов
+    table = ROW_HEURISTIC
+    columns = transpose(board)
+    return (table[board & ROW_MASK] + table[(board >> 16) & ROW_MASK] +
+            table[(board >> 32) & ROW_MASK] + table[(board >> 48) & ROW_MASK] +
+            table[columns & ROW_MASK] + table[(columns >> 16) & ROW_MASK] +
+            table[(columns >> 32) & ROW_MASK] + table[(columns >> 48) & ROW_MASK])
+
+
+class SolverTimeout(Exception):
+    # Время на ход истекло или поиск отменен
+    pass
+
+
+class Expectimax:
+    # Expectimax на упакованном поле 4x4: узлы хода игрока (максимум по направлениям)
+    # чередуются с узлами случая (среднее по пустым клеткам и плиткам 2/4).
+    # Глубина растет, когда пустых клеток мало, результаты узлов кешируются.
+    def __init__(self):
+        self.cache = {}
+        self.deadline = None
+        self.stop_requested = False
+        self.nodes = 0
+        self.depth = 0  # глубина последней завершенной итерации
+        self.elapsed = 0.0
+
+    @staticmethod
+    def max_depth(board):
+        # Чем меньше свободных клеток, тем важнее смотреть дальше (и тем меньше ветвление)
+        empty = bin(zero_cells(board)).count('1')
+        if empty > 6:
+            return 2
+        if empty > 3:
+            return 3
+        return 4
+
+    def chance_node(self, board, depth, probability):
+        if depth == 0 or probability < MIN_PROBABILITY:
+            return heuristic(board)
+        cached = self.cache.get(board)
+        if cached is not None and cached[0] >= depth:
+            return cached[1]
+
+        self.nodes += 1
+        if not self.nodes & 255 and (self.stop_requested or
+                                     self.deadline is not None and time.perf_counter() > self.deadline):
+            raise SolverTimeout
+
+        empty = zero_cells(board)
+        count = bin(empty).count('1')
+        probability /= count
+        total = 0.0
+        while empty:
+            tile = empty & -empty
+            empty ^= tile
+            total += SPAWN_TWO * self.move_node(board | tile, depth, probability * SPAWN_TWO)
+            total += SPAWN_FOUR * self.move_node(board | (tile << 1), depth, probability * SPAWN_FOUR)
+        value = total / count
+        self.cache[board] = (depth, value)
+        return value
+
+    def move_node(self, board, depth, probability):
+        best = 0.0
+        for direction in 'lrud':
+            new_board, _ = move(board, direction)
+            if new_board != board:
+                best = max(best, self.chance_node(new_board, depth - 1, probability))
+        return best
+
+    def search_depth(self, board, depth):
+        # Лучшее направление при поиске на глубину depth (None, если ходов нет)
+        best_direction, best_value = None, -1.0
+        for direction in 'lrud':
+            new_board, _ = move(board, direction)
+            if new_board != board:
+                value = self.chance_node(new_board, depth - 1, 1.0)
+                if value > best_value:
+                    best_direction, best_value = direction, value
+        return best_direction
+
+    def best_move(self, board, time_budget=0.2):
+        # Итеративное углубление до адаптивной глубины в пределах времени на ход
+        if ROW_HEURISTIC is None:
+            build_heuristic()
+        if py2048_engine.ROW_LEFT is None:
+            py2048_engine.build_tables()
+        start = time.perf_counter()
+        self.deadline = None
+        self.nodes = 0
+        self.depth = 0
+        best = None
+        for depth in range(1, self.max_depth(board) + 1):
+            # Кеш хранит значения по глубине от узла, поэтому между итерациями сбрасывается
+            self.cache = {}
+            try:
+                best = self.search_depth(board, depth)
+            except SolverTimeout:
+                break
+            self.depth = depth
+            if best is None or self.stop_requested:
+                break
+            # Первая итерация всегда завершается, дальше следим за временем
+            if time_budget is not None:
+                self.deadline = start + time_budget
+        self.deadline = None
+        self.elapsed = time.perf_counter() - start
+        return best
+
+
+class AIWorker:
+    # Поиск хода в фоновом потоке. По готовности вызывается on_done(направление, поле)
+    # из фонового потока, поэтому обработчик должен быть потокобезопасным.
+    # Запрос, пришедший во время поиска, не теряется: поток возьмет его следующим.
+    def __init__(self, on_done, time_budget=0.2):
+        self.solver = Expectimax()
+        self.on_done = on_done
+        self.time_budget = time_budget
+        self.thread = None
+        self.lock = threading.Lock()
+        self.running = False  # поток ищет ход или еще возьмет запрос из pending
+        self.board = None  # поле, для которого идет поиск
+        self.pending = None  # следующее поле для поиска
+
+    def busy(self):
+        with self.lock:
+            return self.running
+
+    def start(self, board):
+        with self.lock:
+            if self.running:
+                if board != self.board:
+                    self.pending = board
+                return
+            self.running = True
+            self.board = board
+            self.pending = None
+        self.solver.stop_requested = False
+        self.thread = threading.Thread(target=self._run, args=(board,), daemon=True)
+        self.thread.start()
+
+    def _run(self, board):
+        while True:
+            direction = self.solver.best_move(board, self.time_budget)
+            if self.solver.stop_requested:
+                return
+            self.on_done(direction, board)
+            # Решение о завершении принимается под блокировкой, поэтому start
+            # либо увидит, что поток еще работает, либо запустит новый
+            with self.lock:
+                board, self.pending = self.pending, None
+                if board is None:
+                    self.running = False
+                    return
+                self.board = board
+
+    def cancel(self):
+        if self.thread is not None:
+            self.solver.stop_requested = True
+            self.thread.join()
+            self.thread = None
+        with self.lock:
+            self.running = False
+            self.pending = None
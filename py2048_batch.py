@@ -0,0 +1,159 @@
+import argparse
+import time
+
+import numpy as np
+
+# Пакетная симуляция 2048 без окна: N полей хранятся в одном массиве (N, num, num)
+# показателей степени плиток (0 - пусто, 1 - двойка, 2 - четверка, ...), и каждый ход
+# применяется сразу ко всем полям операциями NumPy.
+
+# Номера направлений в массиве ходов
+DIRECTIONS = 'lrud'
+
+
+def slide_left(cells):
+    # Сдвиг и объединение всех строк влево (как get_next_num), возвращает (строки, очки).
+    # cells - массив (M, num, num) показателей плиток.
+    num = cells.shape[-1]
+    # Сначала прижимаем плитки к левому краю: устойчивая сортировка по признаку "пусто"
+    order = np.argsort(cells == 0, axis=-1, kind='stable')
+    cells = np.take_along_axis(cells, order, axis=-1)
+
+    # Слева направо объединяем равные соседние плитки; объединенная плитка
+    # во второй раз не участвует (как skip в get_next_num)
+    score = np.zeros(cells.shape[0], dtype=np.int64)
+    for j in range(num - 1):
+        left = cells[..., j]
+        right = cells[..., j + 1]
+        merge = (left != 0) & (left == right)
+        left[merge] += 1
+        right[merge] = 0
+        score += (np.left_shift(1, left.astype(np.int64)) * merge).sum(axis=-1)
+
+    # После объединений между плитками появились пустые клетки - прижимаем еще раз
+    order = np.argsort(cells == 0, axis=-1, kind='stable')
+    return np.take_along_axis(cells, order, axis=-1), score
+
+
+def oriented(cells, direction, back=False):
+    # Вид полей, в котором ход direction становится сдвигом влево;
+    # back=True - обратное преобразование
+    if direction == 'r':
+        return cells[..., ::-1]
+    if direction == 'u':
+        return cells.transpose(0, 2, 1)
+    if direction == 'd':
+        if back:
+            return cells[..., ::-1].transpose(0, 2, 1)
+        return cells.transpose(0, 2, 1)[..., ::-1]
+    return cells
+
+
+def can_move(cells):
+    # Маска полей, где есть пустая клетка или две равные соседние плитки
+    return (~cells.all(axis=(1, 2)) |
+            (cells[:, :, 1:] == cells[:, :, :-1]).any(axis=(1, 2)) |
+            (cells[:, 1:] == cells[:, :-1]).any(axis=(1, 2)))
+
+
+class BatchGame:
+    # N одновременных партий 2048. Законченные партии не изменяются, их счет сохраняется.
+    def __init__(self, count, num=4, seed=None):
+        self.num = num
+        self.rng = np.random.default_rng(seed)
+        self.cells = np.zeros((count, num, num), dtype=np.uint8)
+        self.score = np.zeros(count, dtype=np.int64)
+        self.moves = np.zeros(count, dtype=np.int64)
+        self.over = np.zeros(count, dtype=bool)
+        # Две стартовые плитки, как gen_num(2) в начале play
+        everyone = np.arange(count)
+        self.spawn(everyone)
+        self.spawn(everyone)
+
+    def spawn(self, index):
+        # Новая плитка на случайной пустой клетке каждого поля из index:
+        # клетка выбирается равновероятно, 4 выпадает в 10% случаев, иначе 2 (как в gen_num)
+        if not len(index):
+            return
+        flat = self.cells.reshape(len(self.cells), -1)
+        empty = flat[index] == 0
+        free = empty.sum(axis=1)
+        # Номер выбранной пустой клетки среди пустых, затем ее позиция в строке поля
+        target = (self.rng.random(len(index)) * free).astype(np.int64)
+        position = (np.cumsum(empty, axis=1) > target[:, None]).argmax(axis=1)
+        flat[index, position] = np.where(self.rng.random(len(index)) < 0.1, 2, 1)
+
+    def step(self, directions):
+        # Ход во всех незаконченных партиях. directions - массив номеров направлений
+        # (индексы в DIRECTIONS) длины N. Если ход изменил поле, появляется новая плитка,
+        # и только после такого хода проверяется конец игры. Возвращает маску изменившихся полей.
+        changed = np.zeros(len(self.cells), dtype=bool)
+        for d, direction in enumerate(DIRECTIONS):
+            index = np.flatnonzero((directions == d) & ~self.over)
+            if not len(index):
+                continue
+            before = self.cells[index]
+            after, score = slide_left(oriented(before, direction).copy())
+            after = oriented(after, direction, back=True)
+            moved = (after != before).any(axis=(1, 2))
+            index = index[moved]
+            self.cells[index] = after[moved]
+            self.score[index] += score[moved]
+            self.moves[index] += 1
+            changed[index] = True
+
+        index = np.flatnonzero(changed)
+        self.spawn(index)
+        self.over[index] = ~can_move(self.cells[index])
+        return changed
+
+    def random_step(self):
+        # Ход в случайном направлении
+        return self.step(self.rng.integers(0, len(DIRECTIONS), len(self.cells)))
+
+    def max_tiles(self):
+        # Самая большая плитка каждого поля
+        return np.left_shift(1, self.cells.max(axis=(1, 2)).astype(np.int64))
+
+
+def simulate(games, batch_size=10000, num=4, seed=None, policy=None, log=print):
+    # Играет games партий блоками по batch_size одновременных полей,
+    # поэтому память ограничена размером блока. policy(batch) возвращает массив
+    # направлений для batch.step; по умолчанию ходы случайные.
+    # Возвращает массивы счета и самых больших плиток всех партий.
+    seeds = np.random.SeedSequence(seed).spawn((games + batch_size - 1) // batch_size)
+    scores = []
+    tiles = []
+    start = time.perf_counter()
+    played = 0
+    for block in seeds:
+        batch = BatchGame(min(batch_size, games - played), num, block)
+        while not batch.over.all():
+            if policy is None:
+                batch.random_step()
+            else:
+                batch.step(policy(batch))
+        scores.append(batch.score)
+        tiles.append(batch.max_tiles())
+        played += len(batch.cells)
+        elapsed = time.perf_counter() - start
+        log("{} games, {:.0f} games/s".format(played, played / elapsed))
+    return np.concatenate(scores), np.concatenate(tiles)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Пакетная симуляция партий 2048 без окна")
+    parser.add_argument('--games', type=int, default=100000)
+    parser.add_argument('--batch', type=int, default=10000, help="число одновременных полей")
+    parser.add_argument('--size', type=int, default=4, help="размер поля")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    scores, tiles = simulate(args.games, args.batch, args.size, args.seed)
+    elapsed = time.perf_counter() - start
+    print("{} games in {:.1f} s ({:.0f} games/s)".format(len(scores), elapsed, len(scores) / elapsed))
+    print("score: mean {:.0f}, max {}".format(scores.mean(), scores.max()))
+    values, counts = np.unique(tiles, return_counts=True)
+    for value, count in zip(values, counts):
+        print("max tile {}: {:.2%}".format(value, count / len(tiles)))
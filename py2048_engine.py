@@ -0,0 +1,132 @@
+import numpy as np
+
+# Упакованное поле 4x4 для 2048: 64-битное число, в каждой клетке 4 бита -
+# показатель степени плитки (0 - пусто, 1 - двойка, 2 - четверка, ...).
+# Клетка (i, j) хранится в битах 4 * (4 * i + j), строка i - в битах 16 * i ... 16 * i + 15.
+# Плитки 32768 (показатель 15) не объединяются: результат не поместился бы в 4 бита.
+
+ROW_MASK = 0xFFFF
+MAX_EXPONENT = 15
+# Младший бит каждой клетки
+NIBBLE_LOW = 0x1111111111111111
+
+# Таблицы для всех 65536 строк: строка после сдвига влево/вправо и набранные очки.
+# Строятся при первом ходе, чтобы не замедлять импорт.
+ROW_LEFT = ROW_RIGHT = SCORE_LEFT = SCORE_RIGHT = None
+
+
+def merge_row(cells):
+    # Сдвиг и объединение одной строки влево (как get_next_num), возвращает (строка, очки)
+    tiles = [e for e in cells if e]
+    merged = []
+    score = 0
+    skip = False
+    for j in range(len(tiles)):
+        if skip:
+            skip = False
+            continue
+        e = tiles[j]
+        if j != len(tiles) - 1 and tiles[j + 1] == e and e < MAX_EXPONENT:
+            e += 1
+            score += 1 << e
+            skip = True
+        merged.append(e)
+    return merged + [0] * (len(cells) - len(merged)), score
+
+
+def build_tables():
+    global ROW_LEFT, ROW_RIGHT, SCORE_LEFT, SCORE_RIGHT
+    row_left = [0] * 65536
+    row_right = [0] * 65536
+    score_left = [0] * 65536
+    score_right = [0] * 65536
+    for row in range(65536):
+        cells = [(row >> (4 * j)) & 0xF for j in range(4)]
+
+        merged, score = merge_row(cells)
+        row_left[row] = merged[0] | merged[1] << 4 | merged[2] << 8 | merged[3] << 12
+        score_left[row] = score
+
+        merged, score = merge_row(cells[::-1])
+        row_right[row] = merged[3] | merged[2] << 4 | merged[1] << 8 | merged[0] << 12
+        score_right[row] = score
+    ROW_LEFT, ROW_RIGHT, SCORE_LEFT, SCORE_RIGHT = row_left, row_right, score_left, score_right
+
+
+def transpose(board):
+    # Транспонирование поля 4x4 (клетка (i, j) переходит в (j, i))
+    a1 = board & 0xF0F00F0FF0F00F0F
+    a2 = board & 0x0000F0F00000F0F0
+    a3 = board & 0x0F0F00000F0F0000
+    a = a1 | (a2 << 12) | (a3 >> 12)
+    b1 = a & 0xFF00FF0000FF00FF
+    b2 = a & 0x00FF00FF00000000
+    b3 = a & 0x00000000FF00FF00
+    return b1 | (b2 >> 24) | (b3 << 24)
+
+
+def shift_rows(board, rows_table, score_table):
+    # Применение таблицы к каждой из четырех строк
+    result = 0
+    score = 0
+    for shift in (0, 16, 32, 48):
+        row = (board >> shift) & ROW_MASK
+        result |= rows_table[row] << shift
+        score += score_table[row]
+    return result, score
+
+
+def move(board, direction):
+    # Ход в направлении 'l', 'r', 'u' или 'd': возвращает (новое поле, набранные очки)
+    if ROW_LEFT is None:
+        build_tables()
+    if direction == 'l':
+        return shift_rows(board, ROW_LEFT, SCORE_LEFT)
+    if direction == 'r':
+        return shift_rows(board, ROW_RIGHT, SCORE_RIGHT)
+    # Столбцы сдвигаются как строки транспонированного поля
+    if direction == 'u':
+        result, score = shift_rows(transpose(board), ROW_LEFT, SCORE_LEFT)
+    else:
+        result, score = shift_rows(transpose(board), ROW_RIGHT, SCORE_RIGHT)
+    return transpose(result), score
+
+
+def encode(grid):
+    # Упаковка поля из матрицы значений плиток
+    board = 0
+    for i in range(4):
+        for j in range(4):
+            n = int(grid[i][j])
+            if n:
+                board |= (n.bit_length() - 1) << (4 * (4 * i + j))
+    return board
+
+
+def decode(board):
+    # Распаковка поля в матрицу значений плиток (для отрисовки)
+    grid = np.zeros((4, 4), dtype=int)
+    for k in range(16):
+        e = (board >> (4 * k)) & 0xF
+        if e:
+            grid[k // 4, k % 4] = 1 << e
+    return grid
+
+
+def zero_cells(x):
+    # Маска (по младшему биту клетки) клеток, в которых все 4 бита нулевые
+    x |= x >> 2
+    x |= x >> 1
+    return ~x & NIBBLE_LOW
+
+
+def can_move(board):
+    # Есть ли хоть один ход: пустая клетка или две равные соседние плитки.
+    # Поле не изменяется и ничего не создается.
+    if zero_cells(board):
+        return True
+    # Равные соседи по горизонтали: клетки j и j + 1 одной строки (j < 3)
+    if zero_cells(board ^ (board >> 4)) & 0x0111011101110111:
+        return True
+    # Равные соседи по вертикали: клетки строк i и i + 1 (i < 3)
+    return bool(zero_cells(board ^ (board >> 16)) & 0x0000111111111111)
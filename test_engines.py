@@ -0,0 +1,190 @@
+import random
+from functools import lru_cache
+
+import numpy as np
+import pytest
+
+import py2048_engine
+from forinarow_board import Position, EMPTY, PLAYER_PIECE, AI_PIECE, WINDOW_LENGTH
+from forinarow_book import Solver
+
+# Проверка быстрых движков по медленным, заведомо правильным реализациям:
+# оценка позиции - окнами по матрице, как в первой версии "4 в ряд",
+# ходы 2048 - списками, как get_next_num, решатель - полным перебором.
+
+# Партии "4 в ряд" на поле 6x7: столбцы ходов, игроки ходят по очереди
+SEQUENCES = ['', '3', '3323', '33224411', '3232441105', '0123456', '333333', '0011223',
+             '6543210654321', '3322114455660']
+
+
+def random_sequences(count, row_count, col_count, length, seed):
+    # Случайные партии без победы (последний ход тоже не выигрывает)
+    rng = random.Random(seed)
+    sequences = []
+    while len(sequences) < count:
+        position = Position(row_count, col_count)
+        moves = []
+        for i in range(length):
+            col = rng.choice(position.valid_moves())
+            position.play(col, PLAYER_PIECE if i % 2 == 0 else AI_PIECE)
+            moves.append(col)
+            if position.last_move_won():
+                break
+        else:
+            sequences.append(moves)
+    return sequences
+
+
+def replay(moves, row_count=6, col_count=7):
+    position = Position(row_count, col_count)
+    for i, col in enumerate(moves):
+        position.play(int(col), PLAYER_PIECE if i % 2 == 0 else AI_PIECE)
+    return position
+
+
+def grid_of(position):
+    # Матрица фишек, строка 0 - нижняя
+    return np.array([[position.cell(r, c) for c in range(position.col_count)]
+                     for r in range(position.row_count)])
+
+
+def windows(grid):
+    # Все окна из четырех клеток: горизонтали, вертикали и обе диагонали
+    rows, cols = grid.shape
+    for r in range(rows):
+        for c in range(cols - 3):
+            yield [grid[r][c + i] for i in range(WINDOW_LENGTH)]
+    for c in range(cols):
+        for r in range(rows - 3):
+            yield [grid[r + i][c] for i in range(WINDOW_LENGTH)]
+    for r in range(rows - 3):
+        for c in range(cols - 3):
+            yield [grid[r + i][c + i] for i in range(WINDOW_LENGTH)]
+            yield [grid[r + 3 - i][c + i] for i in range(WINDOW_LENGTH)]
+
+
+def reference_score(grid, piece):
+    opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
+    score = list(grid[:, grid.shape[1] // 2]).count(piece) * 3
+    for window in windows(grid):
+        if window.count(piece) == 4:
+            score += 100
+        elif window.count(piece) == 3 and window.count(EMPTY) == 1:
+            score += 5
+        elif window.count(piece) == 2 and window.count(EMPTY) == 2:
+            score += 2
+        if window.count(opp_piece) == 3 and window.count(EMPTY) == 1:
+            score -= 4
+    return score
+
+
+def reference_winning(grid, piece):
+    return any(window.count(piece) == WINDOW_LENGTH for window in windows(grid))
+
+
+@pytest.mark.parametrize('moves', SEQUENCES + random_sequences(20, 6, 7, 20, seed=1))
+def test_position_score(moves):
+    position = replay(moves)
+    grid = grid_of(position)
+    for piece in (PLAYER_PIECE, AI_PIECE):
+        assert position.score(piece) == reference_score(grid, piece)
+        assert position.full_score(piece) == reference_score(grid, piece)
+        assert position.is_winning(piece) == reference_winning(grid, piece)
+
+
+@pytest.mark.parametrize('moves', ['0101010', '3434343', '1122334', '01123223633', '65543443033'])
+def test_position_win(moves):
+    # Последний ход каждой партии выигрывает: по вертикали, горизонтали и диагоналям
+    position = replay(moves)
+    piece = position.history[-1][1]
+    assert position.is_winning(piece)
+    assert position.last_move_won()
+    assert reference_winning(grid_of(position), piece)
+    position.undo()
+    assert not position.is_winning(piece)
+    assert position.score(piece) == reference_score(grid_of(position), piece)
+
+
+def reference_move(grid, direction):
+    # Ход 2048 по строкам списков: возвращает (новое поле, набранные очки)
+    lines = [list(row) for row in grid] if direction in 'lr' else [list(col) for col in zip(*grid)]
+    result = []
+    score = 0
+    for line in lines:
+        if direction in 'rd':
+            line = line[::-1]
+        tiles = [n for n in line if n]
+        merged = []
+        j = 0
+        while j < len(tiles):
+            if j + 1 < len(tiles) and tiles[j] == tiles[j + 1]:
+                merged.append(2 * tiles[j])
+                score += 2 * tiles[j]
+                j += 2
+            else:
+                merged.append(tiles[j])
+                j += 1
+        line = merged + [0] * (4 - len(merged))
+        result.append(line[::-1] if direction in 'rd' else line)
+    if direction in 'ud':
+        result = [list(row) for row in zip(*result)]
+    return result, score
+
+
+def boards_2048(count, seed):
+    rng = random.Random(seed)
+    grids = [[[2, 2, 2, 2], [4, 4, 8, 8], [0, 2, 0, 2], [16, 0, 16, 16]],
+             [[2, 4, 8, 16], [4, 8, 16, 32], [8, 16, 32, 64], [16, 32, 64, 128]]]
+    for _ in range(count):
+        grids.append([[(1 << rng.randint(1, 11)) if rng.random() < 0.7 else 0 for _ in range(4)]
+                      for _ in range(4)])
+    return grids
+
+
+@pytest.mark.parametrize('grid', boards_2048(50, seed=2))
+def test_2048_move(grid):
+    board = py2048_engine.encode(grid)
+    assert py2048_engine.decode(board).tolist() == grid
+    for direction in 'lrud':
+        result, score = py2048_engine.move(board, direction)
+        expected, expected_score = reference_move(grid, direction)
+        assert py2048_engine.decode(result).tolist() == expected
+        assert score == expected_score
+
+
+def reference_solve(row_count, col_count, moves):
+    # Оценка позиции полным перебором по матрице фишек в тех же единицах, что у Solver:
+    # выигрыш своим k-м камнем стоит (клеток + 1) // 2 + 1 - k, ничья - 0
+    cells = row_count * col_count
+
+    @lru_cache(maxsize=None)
+    def negamax(cells_tuple, count):
+        grid = np.array(cells_tuple).reshape(row_count, col_count)
+        piece = PLAYER_PIECE if count % 2 == 0 else AI_PIECE
+        if count == cells:
+            return 0
+        best = None
+        for col in range(col_count):
+            free = [r for r in range(row_count) if grid[r][col] == EMPTY]
+            if not free:
+                continue
+            grid[free[0]][col] = piece
+            if reference_winning(grid, piece):
+                score = (cells + 1 - count) // 2
+            else:
+                score = -negamax(tuple(grid.flatten().tolist()), count + 1)
+            grid[free[0]][col] = EMPTY
+            best = score if best is None else max(best, score)
+        return best
+
+    grid = grid_of(replay(moves, row_count, col_count))
+    return negamax(tuple(grid.flatten().tolist()), len(moves))
+
+
+@pytest.mark.parametrize('moves', random_sequences(12, 4, 5, 9, seed=3))
+def test_solver(moves):
+    position = replay(moves, 4, 5)
+    mover = PLAYER_PIECE if len(moves) % 2 == 0 else AI_PIECE
+    solver = Solver(4, 5)
+    assert solver.solve(position.masks[mover], position.occupied, len(moves)) == \
+        reference_solve(4, 5, moves)
@@ -1,47 +1,30 @@
-from copy import deepcopy
-from random import choice
-from random import randrange
-
 import pygame
 
-import music
+import tetris_core
+from tetris_bot import Bot
+from highscores import HighScores
+from profiler import profiler
+from tetris_core import Game, Piece, SHAPES
 
+# Фон игрового поля, загружается один раз (в том числе заранее, фоновым потоком меню)
+BACKGROUND = None
 
-class Tetris:
-    @staticmethod
-    def get_record():
-        """
-        Метод для получения текущего рекорда из файла.
-        Возвращает строку, содержащую наибольшее количество очков.
-        """
-        with open('tetris/hscore_tetris') as fil:
-            return fil.readline()
 
-    @staticmethod
-    def set_record(record, score):
-        """
-        Метод для установки нового рекорда, если текущий score больше сохраненного рекорда.
-        Записывает новый рекорд в файл.
-        """
-        if int(record) < score:
-            with open('tetris/hscore_tetris', 'w') as f:
-                f.write(str(score))
+def load_background():
+    global BACKGROUND
+    if BACKGROUND is None:
+        BACKGROUND = pygame.image.load("tetris/img/bg.png")
+    return BACKGROUND
 
-    @staticmethod
-    def get_next_color():
-        """
-        Генерирует случайный цвет для следующей фигуры.
-        Возвращает кортеж с тремя значениями (R, G, B).
-        """
-        return randrange(30, 256), randrange(30, 256), randrange(30, 256)
 
-    def __init__(self, menu_sc):
+class Tetris:
+    def __init__(self, menu_sc, seed=None):
         """
         Конструктор, инициализирующий все необходимые параметры для игры.
-        Создает окно игры, настраивает начальные параметры и фигуры.
+        Создает окно игры и саму игру (логика - в tetris_core.Game, здесь только окно,
+        клавиши и отрисовка).
         """
-        self.menu_sc = menu_sc
-        pygame.init()
+        self.menu_sc = menu_sc  # pygame уже инициализирован меню
 
         self.running = True  # Флаг, указывающий, работает ли игра
         self.W, self.H = 10, 20  # Размеры игрового поля
@@ -49,10 +32,12 @@ class Tetris:
         self.GAME_RES = self.W * self.TILE, self.H * self.TILE  # Размер игрового экрана
         self.RES = 750, 940  # Общий размер окна
         self.FPS = 60  # Частота кадров в игре
+        self.MAX_TICKS = 5  # Наибольшее число тиков игры за один кадр
 
         # Настройка игрового экрана
         self.screen = pygame.display.set_mode(self.RES)
-        self.game_sc = pygame.Surface(self.GAME_RES)  # Поверхность для игры
+        self.game_sc = pygame.Surface(self.GAME_RES)  # Поверхность для игры: фон, сетка и закрепленные клетки
+        self.game_pos = 20, 20  # Положение игрового поля в окне
         self.clock = pygame.time.Clock()
         pygame.display.set_caption("Tetris")  # Название окна
         programicon = pygame.image.load('icons/tetris.png')  # Иконка программы
@@ -62,31 +47,27 @@ class Tetris:
         self.grid = [pygame.Rect(x * self.TILE, y * self.TILE, self.TILE, self.TILE)
                      for x in range(self.W) for y in range(self.H)]
 
-        # Возможные формы фигур в Tetris
-        figures_pos = [[(-1, 0), (-2, 0), (0, 0), (1, 0)],
-                       [(0, -1), (-1, -1), (-1, 0), (0, 0)],
-                       [(-1, 0), (-1, 1), (0, 0), (0, -1)],
-                       [(0, 0), (-1, 0), (0, 1), (-1, -1)],
-                       [(0, 0), (0, -1), (0, 1), (-1, -1)],
-                       [(0, 0), (0, -1), (0, 1), (1, -1)],
-                       [(0, 0), (0, -1), (0, 1), (-1, 0)]]
-
-        # Перевод позиций в прямоугольники для фигуры
-        self.figures = [[pygame.Rect(x + self.W // 2, y + 1, 1, 1) for x, y in fig_pos] for fig_pos in figures_pos]
-
-        # Прямоугольник для фигуры
+        # Прямоугольник для отрисовки клетки фигуры
         self.figure_rect = pygame.Rect(0, 0, self.TILE - 2, self.TILE - 2)
 
-        # Игровое поле: двумерный массив для отслеживания занятых клеток
-        self.field = [[0 for __ in range(self.W)] for _ in range(self.H)]
+        # Игра: поле, фигуры, падение, очки
+        self.game = Game(self.W, self.H, seed)
+        # Время, прошедшее с последнего тика игры, мс
+        self.tick_time = 0
 
-        # Настройки анимации (скорость падения фигур)
-        self.anim_count, self.anim_speed, self.anim_limit = 0, 60, 2000
+        # Автоигра (клавиша A): бот выбирает положение каждой новой фигуры,
+        # действия до него выполняются по одному за кадр, затем фигура роняется.
+        # Выбор идет прямо в кадре, поэтому без lookahead: с ним он длиннее кадра
+        self.bot = Bot(lookahead=False)
+        self.autoplay = False
+        self.plan = None
 
-        # Фон для игры
-        self.game_bg = pygame.image.load("tetris/img/bg.png").convert()
+        # Фон для игры вместе с сеткой рисуется один раз
+        self.game_bg = load_background().convert()
+        [pygame.draw.rect(self.game_bg, (40, 40, 40), i_rect, 1) for i_rect in self.grid]
 
         # Шрифты для текста
+        self.game_over_font = pygame.font.SysFont("Comic Sans MS", 65)
         main_font = pygame.font.SysFont("Comic Sans MS", 65)
         self.font = pygame.font.SysFont("Comic Sans MS", 45)
 
@@ -95,36 +76,49 @@ class Tetris:
         self.title_score = self.font.render("Score:", True, pygame.Color("green"))
         self.title_record = self.font.render("Hscore:", True, pygame.Color("purple"))
 
-        # Инициализация текущей и следующей фигуры
-        self.figure, self.next_figure = deepcopy(choice(self.figures)), deepcopy(choice(self.figures))
-        self.color, self.next_color = self.get_next_color(), self.get_next_color()
-
-        # Начальные значения очков и линий
-        self.score, self.lines = 0, 0
-        self.scores = {0: 0, 1: 100, 2: 300, 3: 700, 4: 1500}
-
-    def collision_check(self, item):
-        """
-        Метод для проверки, не столкнулась ли фигура с границами поля или другими фигурами.
-        Возвращает False, если есть столкновение, и True, если нет.
-        """
-        if self.figure[item].x < 0 or self.figure[item].x > self.W - 1 or \
-                self.figure[item].y > self.H - 1 or self.field[self.figure[item].y][self.figure[item].x]:
-            return False
-        return True
+        # Неизменная часть окна: черный фон с заголовками
+        self.background = pygame.Surface(self.RES).convert()
+        self.background.fill((0, 0, 0))
+        self.background.blit(self.title_tetris, (485, -10))
+        self.background.blit(self.title_score, (535, 780))
+        self.background.blit(self.title_record, (525, 650))
+
+        # Таблица рекордов читается один раз, на диск пишется только в конце игры
+        self.records = HighScores('tetris/hscore_tetris')
+
+        # Состояние отрисовки: на экране обновляются только изменившиеся области
+        self.redraw_all = True  # перерисовать окно целиком
+        self.field_changed = True  # перерисовать слой закрепленных клеток
+        self.drawn_figure = None  # фигура и цвет, нарисованные на экране
+        self.figure_rects = []  # клетки нарисованной фигуры в координатах окна
+        self.drawn_next = None
+        # Область окна, где может оказаться следующая фигура
+        next_cells = [(x, y) for shape in range(len(SHAPES)) for x, y in Piece.spawn(shape, self.W).cells()]
+        self.next_area = pygame.Rect(min(x for x, _ in next_cells) * self.TILE + 380,
+                                     min(y for _, y in next_cells) * self.TILE + 185, 0, 0)
+        self.next_area.width = (max(x for x, _ in next_cells) + 1) * self.TILE + 380 - self.next_area.x
+        self.next_area.height = (max(y for _, y in next_cells) + 1) * self.TILE + 185 - self.next_area.y
+        # Отрисованные надписи со значениями: имя -> (значение, поверхность, область окна)
+        self.texts = {}
 
     def cycle(self):
         """
         Основной игровой цикл. Отвечает за обработку событий, обновление состояния игры
-        и отрисовку элементов на экране.
+        и отрисовку элементов на экране. Возвращает очки, набранные за игру.
         """
+        profiler.section('tetris')
         while self.running:
-            # Получаем текущий рекорд
-            record = self.get_record()
-            dx, rotate = 0, False  # Перемещение и вращение фигуры
-
-            # Отрисовываем игру
-            self.draw(record)
+            profiler.frame()
+            # Текущий рекорд (с учетом очков этой игры)
+            record = str(max(self.records.best(), self.game.score))
+            action = 0  # Действия игрока за этот кадр
+
+            # Отрисовываем игру и поверх нее панель профайлера (если он включен)
+            dirty = self.draw(record)
+            hud = profiler.draw_hud(self.screen)
+            if hud:
+                dirty.append(hud)
+            profiler.lap('draw')
 
             # Ожидаем событий, таких как нажатие клавиш
             for event in pygame.event.get():
@@ -132,133 +126,154 @@ class Tetris:
                     # Закрытие игры
                     self.running = False
                     self.screen = self.menu_sc
-                    with open("game_end.txt", "w+") as fil:
-                        fil.write("1")
                     break
                 if event.type == pygame.KEYDOWN:
                     # Обработка нажатий клавиш
                     if event.key == pygame.K_LEFT:
-                        dx = -1  # Двигаем фигуру влево
+                        action = action & ~tetris_core.RIGHT | tetris_core.LEFT  # Двигаем фигуру влево
                     if event.key == pygame.K_RIGHT:
-                        dx = 1  # Двигаем фигуру вправо
+                        action = action & ~tetris_core.LEFT | tetris_core.RIGHT  # Двигаем фигуру вправо
                     if event.key == pygame.K_DOWN:
-                        self.anim_limit = 100  # Ускоряем падение фигуры
+                        action |= tetris_core.SOFT_DROP  # Ускоряем падение фигуры
                     if event.key == pygame.K_UP:
-                        rotate = True  # Вращаем фигуру
+                        action |= tetris_core.ROTATE  # Вращаем фигуру
+                    if event.key == pygame.K_a:
+                        self.autoplay = not self.autoplay  # Включаем или выключаем автоигру
+                        self.plan = None
                     if event.key == pygame.K_ESCAPE:
                         # Выход из игры
                         self.running = False
                         self.screen = self.menu_sc
-                        with open("game_end.txt", "w+") as fil:
-                            fil.write("1")
                         break
-                if event.type == music.STOPPED_PLAYING:
-                    # Перезапуск музыки
-                    music.play_music()
+                if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED) or profiler.handle_event(event):
+                    # Окно было перекрыто (или спрятана панель профайлера) - в следующем кадре рисуем его целиком
+                    self.redraw_all = True
             if not self.running:
                 break
+            profiler.lap('events')
+
+            if self.autoplay:
+                action |= self.next_bot_action()
+                profiler.lap('ai')
+
+            # Шаг игры: число тиков падения зависит от прошедшего времени, а не от числа кадров
+            # (не больше MAX_TICKS, чтобы после зависания окна фигура не падала рывком)
+            ticks, self.tick_time = divmod(self.tick_time, 1000 / self.FPS)
+            if self.game.step(action, min(int(ticks), self.MAX_TICKS)):
+                # Фигура закрепилась - слой закрепленных клеток нужно перерисовать
+                self.field_changed = True
+                self.plan = None
+            profiler.lap('logic')
+
+            if self.game.game_over:
+                pygame.display.update(self.draw(record))
+                self.display_game_over()
+                self.running = False
+                self.screen = self.menu_sc
+                break
 
-            # Перемещение фигуры по оси X
-            figure_old = deepcopy(self.figure)
-            for i in range(4):
-                self.figure[i].x += dx
-                if not self.collision_check(i):
-                    self.figure = deepcopy(figure_old)
-                    break
-
-            # Обновление состояния игры (анимирование падения)
-            self.anim_count += self.anim_speed
-            if self.anim_count > self.anim_limit:
-                self.anim_count = 0
-                figure_old = deepcopy(self.figure)
-                for i in range(4):
-                    self.figure[i].y += 1
-                    if not self.collision_check(i):
-                        # Закрепляем фигуру на поле
-                        for j in range(4):
-                            self.field[figure_old[j].y][figure_old[j].x] = self.color
-                        # Генерация новой фигуры
-                        self.figure, self.color = self.next_figure, self.next_color
-                        self.next_figure, self.next_color = deepcopy(choice(self.figures)), self.get_next_color()
-                        self.anim_limit = 2000
-                        break
+            # Обновление на экране только изменившихся областей
+            pygame.display.update(dirty)
+            profiler.lap('display')
+            self.tick_time += self.clock.tick(self.FPS)
+            profiler.lap('wait')
 
-            # Поворот фигуры
-            center = self.figure[0]
-            figure_old = deepcopy(self.figure)
-            if rotate:
-                for i in range(4):
-                    x = self.figure[i].y - center.y
-                    y = self.figure[i].x - center.x
-                    self.figure[i].x = center.x - x
-                    self.figure[i].y = center.y + y
-                    if not self.collision_check(i):
-                        self.figure = deepcopy(figure_old)
-                        break
+        # Результат игры попадает в таблицу рекордов, файл перезаписывается, только если она изменилась
+        self.records.add(self.game.score)
+        self.records.save()
+        return self.game.score
 
-            # Очистка заполненных линий
-            line, lines = self.H - 1, 0
-            for row in range(self.H - 1, -1, -1):
-                count = 0
-                for col in range(self.W):
-                    if self.field[row][col]:
-                        count += 1
-                if count == self.W:
-                    lines += 1
-                    self.field.pop(row)
-                    self.field.insert(0, [0 for _ in range(self.W)])
-                else:
-                    line -= 1
-
-            # Обновление очков
-            self.score += self.scores.get(lines, 0)
-            self.lines += lines
-            if lines:
-                self.anim_limit -= 100
-
-            # Установка рекорда, если необходимо
-            self.set_record(record, self.score)
-
-            # Обновление экрана
-            pygame.display.update()
-            self.clock.tick(self.FPS)
+    def next_bot_action(self):
+        """
+        Следующее действие автоигры. Для новой фигуры бот выбирает положение и путь к нему.
+        """
+        if self.plan is None:
+            choice = self.bot.choose(self.game)
+            self.plan = choice[1] if choice is not None else []
+        if self.plan:
+            return self.plan.pop(0)
+        return tetris_core.HARD_DROP
+
+    def display_game_over(self):
+        """
+        Надпись "GAME OVER" поверх игрового поля на две секунды.
+        """
+        text = self.game_over_font.render("GAME OVER", True, pygame.Color("red"))
+        rect = text.get_rect(center=(self.game_pos[0] + self.GAME_RES[0] // 2,
+                                     self.game_pos[1] + self.GAME_RES[1] // 2))
+        self.screen.blit(text, rect)
+        pygame.display.update(rect)
+        pygame.time.delay(2000)
 
     def draw(self, record):
         """
-        Отрисовка всех элементов игры: сетки, фигур, фона, очков и рекорда.
+        Отрисовка изменившихся элементов игры: поля с закрепленными фигурами, текущей
+        и следующей фигуры, очков и рекорда. Неизменные части остаются на экране с прошлых кадров.
+        Возвращает список областей окна, которые нужно обновить.
         """
-        # Заполнение фона
-        self.screen.fill((0, 0, 0))
-        self.screen.blit(self.game_sc, (20, 20))
-        self.game_sc.blit(self.game_bg, (0, 0))
-
-        # Отрисовка сетки
-        [pygame.draw.rect(self.game_sc, (40, 40, 40), i_rect, 1) for i_rect in self.grid]
-
-        # Отрисовка текущей фигуры
-        for i in range(4):
-            self.figure_rect.x = self.figure[i].x * self.TILE
-            self.figure_rect.y = self.figure[i].y * self.TILE
-            pygame.draw.rect(self.game_sc, self.color, self.figure_rect)
-
-        # Отрисовка закрепленных фигур
-        for y, row in enumerate(self.field):
-            for x, col in enumerate(row):
-                if col:
-                    self.figure_rect.x, self.figure_rect.y = x * self.TILE, y * self.TILE
-                    pygame.draw.rect(self.game_sc, col, self.figure_rect)
+        dirty = []
+        if self.redraw_all:
+            # Фон окна и неизменные заголовки
+            self.screen.blit(self.background, (0, 0))
+            self.texts = {}
+            self.drawn_next = None
+            self.field_changed = True
+            dirty.append(self.screen.get_rect())
+            self.redraw_all = False
+
+        if self.field_changed:
+            # Слой закрепленных клеток строится заново только после закрепления фигуры
+            self.game_sc.blit(self.game_bg, (0, 0))
+            for x, y, color in self.game.field.cells():
+                self.figure_rect.x, self.figure_rect.y = x * self.TILE, y * self.TILE
+                pygame.draw.rect(self.game_sc, color, self.figure_rect)
+            dirty.append(self.screen.blit(self.game_sc, self.game_pos))
+            self.drawn_figure = None
+            self.figure_rects = []
+            self.field_changed = False
+
+        # Текущая фигура: на месте старой восстанавливаем слой поля, затем рисуем новую
+        if (self.game.figure, self.game.color) != self.drawn_figure:
+            for rect in self.figure_rects:
+                self.screen.blit(self.game_sc, rect, rect.move(-self.game_pos[0], -self.game_pos[1]))
+            dirty.extend(self.figure_rects)
+            self.figure_rects = []
+            for x, y in self.game.figure.cells():
+                rect = pygame.Rect(x * self.TILE + self.game_pos[0], y * self.TILE + self.game_pos[1],
+                                   self.TILE - 2, self.TILE - 2)
+                pygame.draw.rect(self.screen, self.game.color, rect)
+                self.figure_rects.append(rect)
+            dirty.extend(self.figure_rects)
+            self.drawn_figure = self.game.figure, self.game.color
 
         # Отрисовка следующей фигуры
-        for i in range(4):
-            self.figure_rect.x = self.next_figure[i].x * self.TILE + 380
-            self.figure_rect.y = self.next_figure[i].y * self.TILE + 185
-            pygame.draw.rect(self.screen, self.next_color, self.figure_rect)
-
-        # Отображение очков
-        self.screen.blit(self.title_tetris, (485, -10))
-        self.screen.blit(self.title_score, (535, 780))
-        self.screen.blit(self.font.render(str(self.score), True, pygame.Color("white")), (550, 840))
-
-        # Отображение рекорда
-        self.screen.blit(self.title_record, (525, 650))
-        self.screen.blit(self.font.render(record, True, pygame.Color("gold")), (550, 710))
+        if (self.game.next_figure, self.game.next_color) != self.drawn_next:
+            self.screen.blit(self.background, self.next_area, self.next_area)
+            for x, y in self.game.next_figure.cells():
+                self.figure_rect.x, self.figure_rect.y = x * self.TILE + 380, y * self.TILE + 185
+                pygame.draw.rect(self.screen, self.game.next_color, self.figure_rect)
+            dirty.append(self.next_area)
+            self.drawn_next = self.game.next_figure, self.game.next_color
+
+        # Отображение очков и рекорда
+        dirty.extend(self.draw_text('score', str(self.game.score), pygame.Color("white"), (550, 840)))
+        dirty.extend(self.draw_text('record', record, pygame.Color("gold"), (550, 710)))
+        return dirty
+
+    def draw_text(self, name, value, color, pos):
+        """
+        Вывод надписи со значением. Надпись отрисовывается шрифтом заново, только если значение изменилось.
+        Возвращает измененные области окна.
+        """
+        drawn = self.texts.get(name)
+        if drawn is not None and drawn[0] == value:
+            return []
+        dirty = []
+        if drawn is not None:
+            self.screen.blit(self.background, drawn[2], drawn[2])
+            dirty.append(drawn[2])
+        surface = self.font.render(value, True, color)
+        rect = self.screen.blit(surface, pos)
+        self.texts[name] = value, surface, rect
+        dirty.append(rect)
+        return dirty
@@ -0,0 +1,226 @@
+import argparse
+import time
+from collections import deque
+
+import numpy as np
+
+import tetris_core
+from tetris_core import Game, Piece, ROTATION_MASKS, piece_fits
+
+# Веса признаков поля (линейная оценка, как в известных ботах для тетриса):
+# суммарная высота столбцов, очищенные линии, дыры, неровность поверхности
+HEIGHT_WEIGHT = -0.510066
+LINES_WEIGHT = 0.760666
+HOLES_WEIGHT = -0.35663
+BUMPINESS_WEIGHT = -0.184483
+# Оценка поля, на котором следующей фигуре нет места
+LOST_SCORE = -1e9
+
+
+def place(rows, full_row, piece):
+    """
+    Поле из масок строк после закрепления фигуры: (новые строки, число очищенных линий).
+    """
+    left, top, masks = ROTATION_MASKS[piece.shape][piece.rotation]
+    x = piece.x + left
+    y = piece.y + top
+    rows = list(rows)
+    for i, mask in enumerate(masks):
+        rows[y + i] |= mask << x
+    kept = [row for row in rows if row != full_row]
+    lines = len(rows) - len(kept)
+    if lines:
+        rows = [0] * lines + kept
+    return rows, lines
+
+
+def placements(rows, full_row, piece):
+    """
+    Все положения, куда фигуру можно довести с места piece теми же ходами, что и в игре
+    (сдвиг влево/вправо, поворот - только если фигура помещается), и затем уронить.
+    Возвращает список (конечное положение фигуры, список действий до падения).
+    Проверки сделаны прямо на масках строк, без создания промежуточных фигур.
+    """
+    height = len(rows)
+    states = ROTATION_MASKS[piece.shape]
+
+    def shifted(rotation, x):
+        # Маски строк фигуры, сдвинутые в столбец x, и ее верхняя строка относительно y (None - за краем)
+        left, top, masks = states[rotation]
+        x += left
+        if x < 0:
+            return None, top
+        masks = [mask << x for mask in masks]
+        if any(mask & ~full_row for mask in masks):
+            return None, top
+        return masks, top
+
+    def collides(masks, y):
+        # Пересекаются ли маски, начиная со строки y, с полем или его дном и верхом
+        if y < 0 or y + len(masks) > height:
+            return True
+        for i, mask in enumerate(masks):
+            if rows[y + i] & mask:
+                return True
+        return False
+
+    # Обход в ширину по (поворот, столбец) на исходной высоте фигуры
+    paths = {(piece.rotation, piece.x): []}
+    queue = deque([(piece.rotation, piece.x)])
+    while queue:
+        rotation, x = queue.popleft()
+        path = paths[(rotation, x)]
+        for action, key in ((tetris_core.LEFT, (rotation, x - 1)),
+                            (tetris_core.RIGHT, (rotation, x + 1)),
+                            (tetris_core.ROTATE, ((rotation + 1) % 4, x))):
+            if key in paths:
+                continue
+            masks, top = shifted(*key)
+            if masks is not None and not collides(masks, piece.y + top):
+                paths[key] = path + [action]
+                queue.append(key)
+
+    # Строки выше верхней занятой пустые: через них фигура падает без проверок
+    surface = next((y for y, row in enumerate(rows) if row), height)
+
+    result = []
+    seen = set()
+    for (rotation, x), path in paths.items():
+        # Падение до упора
+        masks, top = shifted(rotation, x)
+        y = max(piece.y + top, surface - len(masks))
+        while not collides(masks, y + 1):
+            y += 1
+        # Разные повороты могут дать одинаковые клетки
+        key = (tuple(masks), y)
+        if key not in seen:
+            seen.add(key)
+            result.append((Piece(piece.shape, rotation, x, y - top), path))
+    return result
+
+
+def evaluate(rows, lines, width):
+    """
+    Оценка сразу многих полей. rows - массив (N, высота) масок строк, lines - массив (N,)
+    очищенных линий. Признаки считаются векторно по всем полям сразу.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    height = rows.shape[1]
+    cells = (rows[:, :, None] >> np.arange(width)) & 1  # (N, высота, ширина)
+    filled = cells.any(axis=1)
+    # Высота столбца - от дна до верхней занятой клетки
+    heights = np.where(filled, height - cells.argmax(axis=1), 0)
+    # Дыры - пустые клетки ниже верхней занятой клетки своего столбца
+    holes = heights.sum(axis=1) - cells.sum(axis=(1, 2))
+    bumpiness = np.abs(np.diff(heights, axis=1)).sum(axis=1)
+    return (HEIGHT_WEIGHT * heights.sum(axis=1) + LINES_WEIGHT * np.asarray(lines) +
+            HOLES_WEIGHT * holes + BUMPINESS_WEIGHT * bumpiness)
+
+
+class Bot:
+    """
+    Автоигрок: перебирает все достижимые положения текущей фигуры, оценивает получившиеся
+    поля и выбирает лучшее. С lookahead=True для каждого положения перебираются еще и
+    положения следующей фигуры (next_figure), и все поля второго уровня оцениваются одним пакетом.
+    Выбор с lookahead занимает десятки миллисекунд, больше кадра (16.7 мс при 60 FPS),
+    поэтому он только для игры без окна; автоигра в окне использует бота без него.
+    """
+
+    def __init__(self, lookahead=False):
+        self.lookahead = lookahead
+        self.elapsed = 0.0  # время последнего выбора хода
+        self.worst = 0.0  # наибольшее время выбора хода
+
+    def choose(self, game):
+        """
+        Лучшее положение текущей фигуры игры: (положение, список действий до падения) или None.
+        """
+        start = time.perf_counter()
+        full_row = game.field.full_row
+        rows = game.field.rows
+        candidates = placements(rows, full_row, game.figure)
+        if not candidates:
+            return None
+
+        fields = []
+        lines = []
+        for piece, _ in candidates:
+            field, cleared = place(rows, full_row, piece)
+            fields.append(field)
+            lines.append(cleared)
+
+        if self.lookahead:
+            scores = self.lookahead_scores(fields, lines, full_row, game.next_figure, game.width)
+        else:
+            scores = evaluate(fields, lines, game.width)
+            # Поле, где следующая фигура не появится, - проигрыш
+            for i, field in enumerate(fields):
+                if not piece_fits(field, full_row, game.next_figure):
+                    scores[i] = LOST_SCORE
+        self.elapsed = time.perf_counter() - start
+        self.worst = max(self.worst, self.elapsed)
+        return candidates[int(np.argmax(scores))]
+
+    @staticmethod
+    def lookahead_scores(fields, lines, full_row, next_figure, width):
+        """
+        Оценка каждого поля по лучшему положению следующей фигуры на нем.
+        """
+        second_fields = []
+        second_lines = []
+        groups = []  # (поле первого уровня, начало его полей второго уровня)
+        for i, field in enumerate(fields):
+            if not piece_fits(field, full_row, next_figure):
+                continue
+            candidates = placements(field, full_row, next_figure)
+            if not candidates:
+                continue
+            groups.append((i, len(second_fields)))
+            for piece, _ in candidates:
+                second, cleared = place(field, full_row, piece)
+                second_fields.append(second)
+                second_lines.append(lines[i] + cleared)
+
+        scores = np.full(len(fields), LOST_SCORE)
+        if groups:
+            values = evaluate(second_fields, second_lines, width)
+            best = np.maximum.reduceat(values, [start for _, start in groups])
+            scores[[i for i, _ in groups]] = best
+        return scores
+
+
+def play_game(bot, seed=None, width=10, height=20, max_pieces=None):
+    """
+    Партия без окна: бот доводит каждую фигуру до выбранного положения и роняет ее.
+    Возвращает закончившуюся игру.
+    """
+    game = Game(width, height, seed)
+    while not game.game_over and (max_pieces is None or game.pieces < max_pieces):
+        choice = bot.choose(game)
+        if choice is not None:
+            for action in choice[1]:
+                game.step(action, 0)
+        game.step(tetris_core.HARD_DROP)
+    return game
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Игра бота в тетрис без окна")
+    parser.add_argument('--games', type=int, default=10)
+    parser.add_argument('--pieces', type=int, default=500, help="наибольшее число фигур в партии")
+    parser.add_argument('--lookahead', action='store_true',
+                        help="учитывать следующую фигуру (медленнее, чем кадр игры: только без окна)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    bot = Bot(args.lookahead)
+    start = time.perf_counter()
+    moves = 0
+    for g in range(args.games):
+        game = play_game(bot, args.seed + g, max_pieces=args.pieces)
+        moves += game.pieces
+        print("game {}: {} pieces, {} lines, score {}{}".format(g, game.pieces, game.lines, game.score,
+                                                                  ", game over" if game.game_over else ""))
+    elapsed = time.perf_counter() - start
+    # Худшее время выбора хода сравнивается с кадром игры: 16.7 мс при 60 FPS
+    print("{:.2f} ms per piece, worst choice {:.2f} ms".format(1000 * elapsed / max(moves, 1), 1000 * bot.worst))
@@ -0,0 +1,265 @@
+import random
+from typing import NamedTuple
+
+# Формы фигур: координаты четырех клеток, первая клетка - центр поворота
+SHAPES = [[(-1, 0), (-2, 0), (0, 0), (1, 0)],
+          [(0, -1), (-1, -1), (-1, 0), (0, 0)],
+          [(-1, 0), (-1, 1), (0, 0), (0, -1)],
+          [(0, 0), (-1, 0), (0, 1), (-1, -1)],
+          [(0, 0), (0, -1), (0, 1), (-1, -1)],
+          [(0, 0), (0, -1), (0, 1), (1, -1)],
+          [(0, 0), (0, -1), (0, 1), (-1, 0)]]
+
+# Очки за число линий, очищенных одной фигурой
+LINE_SCORES = {0: 0, 1: 100, 2: 300, 3: 700, 4: 1500}
+
+# Действия игрока за один шаг игры (можно объединять через |)
+LEFT = 1
+RIGHT = 2
+ROTATE = 4
+SOFT_DROP = 8  # ускоренное падение до закрепления фигуры
+HARD_DROP = 16  # фигура сразу падает до упора и закрепляется
+
+
+def build_rotations(shape):
+    """
+    Четыре состояния поворота фигуры: смещения клеток относительно первой клетки.
+    Поворот тот же, что и раньше в игре: (dx, dy) -> (-dy, dx) вокруг первой клетки.
+    """
+    cx, cy = shape[0]
+    offsets = tuple((x - cx, y - cy) for x, y in shape)
+    states = []
+    for _ in range(4):
+        states.append(offsets)
+        offsets = tuple((-dy, dx) for dx, dy in offsets)
+    return tuple(states)
+
+
+def build_masks(offsets):
+    """
+    Состояние поворота в виде масок строк: (левый столбец, верхняя строка, маски строк),
+    столбцы и строки отсчитываются от первой клетки фигуры.
+    """
+    left = min(dx for dx, _ in offsets)
+    top = min(dy for _, dy in offsets)
+    masks = [0] * (max(dy for _, dy in offsets) - top + 1)
+    for dx, dy in offsets:
+        masks[dy - top] |= 1 << (dx - left)
+    return left, top, tuple(masks)
+
+
+ROTATIONS = tuple(build_rotations(shape) for shape in SHAPES)
+ROTATION_MASKS = tuple(tuple(build_masks(offsets) for offsets in states) for states in ROTATIONS)
+
+
+class Piece(NamedTuple):
+    """
+    Фигура: номер формы, номер поворота и клетка (x, y), в которой стоит первая клетка формы.
+    Неизменяемая: ход создает новую фигуру, старая остается прежней.
+    """
+    shape: int
+    rotation: int
+    x: int
+    y: int
+
+    @classmethod
+    def spawn(cls, shape, width):
+        """
+        Новая фигура у верхнего края поля шириной width (там же, где появлялись раньше).
+        """
+        x, y = SHAPES[shape][0]
+        return cls(shape, 0, x + width // 2, y + 1)
+
+    def cells(self):
+        """
+        Клетки фигуры на поле, первой идет центр поворота.
+        """
+        x, y = self.x, self.y
+        return [(x + dx, y + dy) for dx, dy in ROTATIONS[self.shape][self.rotation]]
+
+
+def piece_fits(rows, full_row, piece):
+    """
+    Помещается ли фигура на поле из масок строк rows (full_row - маска полной строки).
+    """
+    left, top, masks = ROTATION_MASKS[piece.shape][piece.rotation]
+    x = piece.x + left
+    y = piece.y + top
+    if x < 0 or y < 0 or y + len(masks) > len(rows):
+        return False
+    for i, mask in enumerate(masks):
+        mask <<= x
+        if mask & ~full_row or rows[y + i] & mask:
+            return False
+    return True
+
+
+class Field:
+    """
+    Игровое поле тетриса. Занятость клеток хранится битовыми масками:
+    одно целое число на строку, бит x отвечает за столбец x.
+    Цвета закрепленных клеток хранятся отдельно, по 3 байта (R, G, B) на клетку.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.full_row = (1 << width) - 1  # маска полностью заполненной строки
+        self.rows = [0] * height
+        self.colors = [bytearray(3 * width) for _ in range(height)]
+
+    def fits(self, piece):
+        """
+        Помещается ли фигура на поле: маски ее строк не выходят за края и не пересекаются с занятыми клетками.
+        """
+        return piece_fits(self.rows, self.full_row, piece)
+
+    def try_move(self, piece, dx=0, dy=0, rotate=False):
+        """
+        Фигура после сдвига на (dx, dy) и/или поворота или None, если она туда не помещается.
+        Ни поле, ни исходная фигура не меняются.
+        """
+        moved = Piece(piece.shape, (piece.rotation + 1) % 4 if rotate else piece.rotation,
+                      piece.x + dx, piece.y + dy)
+        return moved if self.fits(moved) else None
+
+    def lock(self, cells, color):
+        """
+        Закрепление фигуры из клеток cells цветом color.
+        Заполненные строки ищутся только среди строк фигуры, очищаются и сдвигают поле вниз.
+        Возвращает число очищенных строк.
+        """
+        touched = set()
+        for x, y in cells:
+            self.rows[y] |= 1 << x
+            self.colors[y][3 * x:3 * x + 3] = bytes(color)
+            touched.add(y)
+        full = [y for y in touched if self.rows[y] == self.full_row]
+        if full:
+            self.clear(full)
+        return len(full)
+
+    def clear(self, full):
+        """
+        Удаление строк с номерами full: остальные строки сохраняют порядок и опускаются вниз,
+        сверху добавляются пустые.
+        """
+        full = set(full)
+        kept = [y for y in range(self.height) if y not in full]
+        self.rows = [0] * len(full) + [self.rows[y] for y in kept]
+        self.colors = [bytearray(3 * self.width) for _ in full] + [self.colors[y] for y in kept]
+
+    def cells(self):
+        """
+        Перебор закрепленных клеток: (x, y, цвет).
+        """
+        for y, row in enumerate(self.rows):
+            colors = self.colors[y]
+            while row:
+                bit = row & -row
+                row ^= bit
+                x = bit.bit_length() - 1
+                yield x, y, tuple(colors[3 * x:3 * x + 3])
+
+
+class Game:
+    """
+    Игра в тетрис без окна и без pygame. Один шаг step соответствует одному кадру
+    при 60 кадрах в секунду: действие игрока, падение фигуры, поворот.
+    Фигуры и цвета берутся из собственного генератора случайных чисел,
+    поэтому при одинаковом seed игра повторяется в точности.
+    """
+
+    def __init__(self, width=10, height=20, seed=None):
+        self.width = width
+        self.height = height
+        self.rng = random.Random(seed)
+        self.field = Field(width, height)
+
+        # Настройки падения фигур: счетчик растет на anim_speed за тик,
+        # фигура опускается, когда он превышает anim_limit
+        self.anim_count, self.anim_speed, self.anim_limit = 0, 60, 2000
+
+        self.figure, self.next_figure = self.get_next_figure(), self.get_next_figure()
+        self.color, self.next_color = self.get_next_color(), self.get_next_color()
+
+        self.score, self.lines = 0, 0
+        self.pieces = 0  # число закрепленных фигур
+        self.game_over = False
+
+    def get_next_figure(self):
+        """
+        Случайная фигура в начальном положении у верхнего края поля.
+        """
+        return Piece.spawn(self.rng.randrange(len(SHAPES)), self.width)
+
+    def get_next_color(self):
+        """
+        Случайный цвет фигуры (R, G, B).
+        """
+        return self.rng.randrange(30, 256), self.rng.randrange(30, 256), self.rng.randrange(30, 256)
+
+    def lock(self):
+        """
+        Закрепление текущей фигуры, очистка линий, подсчет очков и появление следующей фигуры.
+        Если новой фигуре нет места, игра окончена.
+        """
+        lines = self.field.lock(self.figure.cells(), self.color)
+        self.pieces += 1
+        self.score += LINE_SCORES.get(lines, 0)
+        self.lines += lines
+        self.figure, self.color = self.next_figure, self.next_color
+        self.next_figure, self.next_color = self.get_next_figure(), self.get_next_color()
+        self.anim_limit = 2000
+        # После очищенных линий новая фигура падает быстрее
+        if lines:
+            self.anim_limit -= 100
+        if not self.field.fits(self.figure):
+            self.game_over = True
+
+    def step(self, action=0, ticks=1):
+        """
+        Один шаг игры: действие action (сочетание LEFT, RIGHT, ROTATE, SOFT_DROP, HARD_DROP),
+        затем ticks тиков падения (тик - 1/60 секунды, так скорость не зависит от частоты кадров),
+        затем поворот. Возвращает True, если фигура закрепилась.
+        """
+        if self.game_over:
+            return False
+        pieces = self.pieces
+
+        if action & SOFT_DROP:
+            self.anim_limit = 100  # Ускоряем падение фигуры
+
+        # Перемещение фигуры по оси X (если фигура не помещается, она остается на месте)
+        dx = 1 if action & RIGHT else -1 if action & LEFT else 0
+        if dx:
+            self.figure = self.field.try_move(self.figure, dx=dx) or self.figure
+
+        if action & HARD_DROP:
+            while True:
+                figure_new = self.field.try_move(self.figure, dy=1)
+                if not figure_new:
+                    break
+                self.figure = figure_new
+            self.anim_count = 0
+            self.lock()
+            return True
+
+        # Падение фигуры
+        for _ in range(ticks):
+            self.anim_count += self.anim_speed
+            if self.anim_count > self.anim_limit:
+                self.anim_count = 0
+                figure_new = self.field.try_move(self.figure, dy=1)
+                if figure_new:
+                    self.figure = figure_new
+                else:
+                    # Заполненные линии могут появиться только при закреплении фигуры
+                    self.lock()
+                    if self.game_over:
+                        return True
+
+        # Поворот фигуры вокруг ее первой клетки
+        if action & ROTATE:
+            self.figure = self.field.try_move(self.figure, rotate=True) or self.figure
+        return self.pieces != pieces